@@ -14,42 +14,59 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-from collections import namedtuple
+import threading
+from collections import namedtuple, deque
 from itertools import chain
 from inflect import CASES_ABRV
 from fatal_error import fatalError, typeError, notfoundError, warning, TampioError
-from hierarchy import Class, classes, getClass, isClass, classSet, getFunctions, getFields
+from hierarchy import Class, ClassSet, Hierarchy, currentHierarchy, addClass, getClass, classSet, classesByName, classesOfTypeName, memberIndex
 
 # kääntäjän tila
+#
+# CompilerContext sisältää yhden käännösistunnon tilan: globaalit muuttujat, luokkien aliakset ja
+# luokkahierarkian. Sama konteksti annetaan kaikille saman istunnon moduuleille (esim. std.itp ja
+# käännettävä tiedosto). AST-solmut käyttävät nykyisen säikeen aktiivista kontekstia, jonka
+# CompilerFrame asettaa, joten eri konteksteja voidaan käyttää yhtä aikaa eri säikeissä.
+
+ACTIVE = threading.local()
 
-def initializeCompiler(include_file):
-	global global_variables, aliases, includeFile, options, block_frame, tokens
-	options = {}
-	block_frame = BlockData(None, set(), False, None)
-	global_variables = {}
-	aliases = {}
-	includeFile = include_file
-	tokens = None
+class CompilerContext:
+	def __init__(self, include_file):
+		self.include_file = include_file
+		self.global_variables = {}
+		self.aliases = {}
+		self.hierarchy = Hierarchy()
+		self.type_inference = TypeInference()
+		self.options = {}
+		self.block_frame = BlockData(None, set(), False, None)
+		self.tokens = None
+
+def compilerContext():
+	return ACTIVE.compiler
 
 class CompilerFrame:
-	def __init__(self, tl):
+	def __init__(self, context, tl):
+		self.context = context
 		self.tokens = tl
 	def __enter__(self):
-		global options, block_frame, tokens
-		self.prev_options = options
-		self.prev_block_frame = block_frame
-		self.prev_tokens = tokens
-		options = {
+		self.prev_context = getattr(ACTIVE, "compiler", None)
+		ACTIVE.compiler = self.context
+		self.context.hierarchy.__enter__()
+		self.prev_options = self.context.options
+		self.prev_block_frame = self.context.block_frame
+		self.prev_tokens = self.context.tokens
+		self.context.options = {
 			"kohdekoodi": False,
 			"käyttömäärittelyt": False
 		}
-		block_frame = BlockData(None, {}, False, None)
-		tokens = self.tokens
+		self.context.block_frame = BlockData(None, {}, False, None)
+		self.context.tokens = self.tokens
 	def __exit__(self, *args):
-		global options, block_frame, tokens
-		options = self.prev_options
-		block_frame = self.prev_block_frame
-		tokens = self.prev_tokens
+		self.context.options = self.prev_options
+		self.context.block_frame = self.prev_block_frame
+		self.context.tokens = self.prev_tokens
+		self.context.hierarchy.__exit__(*args)
+		ACTIVE.compiler = self.prev_context
 
 BlockData = namedtuple("BlockData", "variables backreferences block_mode self_type")
 
@@ -57,12 +74,11 @@ class BlockFrame:
 	def __init__(self, new_frame):
 		self.new_frame = new_frame
 	def __enter__(self):
-		global block_frame
-		self.prev_frame = block_frame
-		block_frame = self.new_frame
+		self.context = compilerContext()
+		self.prev_frame = self.context.block_frame
+		self.context.block_frame = self.new_frame
 	def __exit__(self, *args):
-		global block_frame
-		block_frame = self.prev_frame
+		self.context.block_frame = self.prev_frame
 
 # apufunktiot
 
@@ -73,6 +89,7 @@ def formAbrv(form):
 		return form[0].upper() + form[1:].lower()
 
 def typeToJs(typename):
+	aliases = compilerContext().aliases
 	while typename in aliases:
 		typename = aliases[typename]
 	return escapeIdentifier(typename)
@@ -82,60 +99,82 @@ def escapeIdentifier(identifier):
 
 # moduulin käätäminen
 
-def compileModule(declarations, on_error, tokens):
-	with CompilerFrame(tokens):
+class JSWriter:
+	# kerää käännetyn koodin palat listaan tai kirjoittaa ne heti virtaan (esim. sys.stdout), jolloin
+	# koko ohjelmaa ei tarvitse pitää muistissa yhtenä merkkijonona
+	def __init__(self, stream=None):
+		self.stream = stream
+		self.parts = []
+	def write(self, code):
+		if self.stream:
+			self.stream.write(code)
+		else:
+			self.parts.append(code)
+	def getvalue(self):
+		return "".join(self.parts)
+
+# jos out on JSWriter, koodi kirjoitetaan siihen määrittely kerrallaan, muuten se palautetaan merkkijonona
+def compileModule(declarations, on_error, tokens, context, out=None):
+	with CompilerFrame(context, tokens):
 		for decl in declarations:
 			try:
 				decl.buildHierarchy()
 			except TampioError as e:
 				on_error(e)
-	with CompilerFrame(tokens):
-		ans = ""
-		additional_statements = ""
+	ans = out or JSWriter()
+	with CompilerFrame(context, tokens):
+		# lisälauseet suoritetaan vasta, kun kaikki määrittelyt on käännetty
+		additional_statements = []
 		for decl in declarations:
 			try:
 				decl.validateTree()
-				ans += decl.compile() + "\n"
-				additional_statements += decl.compileAdditionalStatements()
+				ans.write(decl.compile() + "\n")
+				additional_statements.append(decl.compileAdditionalStatements())
 			except TampioError as e:
 				on_error(e)
-		return ans + additional_statements
+		for code in additional_statements:
+			ans.write(code)
+	if not out:
+		return ans.getvalue()
 
 # lohkon kääntäminen
 
 def compileBlock(statements, indent, parameters):
+	statement_variables = [stmt.statementVariables() for stmt in statements]
 	bcs = set()
-	for stmt in statements:
-		bcs.update(set(stmt.backreferences()))
+	for stmt_variables in statement_variables:
+		bcs.update(stmt_variables.backreferences)
 	
-	ans = ""
+	ans = JSWriter()
 	for bc in bcs:
-		ans += " "*indent + "var se_" + escapeIdentifier(bc) + " = null;\n"
+		ans.write(" "*indent + "var se_" + escapeIdentifier(bc) + " = null;\n")
 	
-	prev_variables = block_frame.variables or {**global_variables}
+	context = compilerContext()
+	block_frame = context.block_frame
+	prev_variables = block_frame.variables or {**context.global_variables}
 	variables = {**prev_variables, **parameters}
 	
 	with BlockFrame(BlockData(variables, bcs, True, block_frame.self_type)):
-		for stmt in statements:
+		for stmt, stmt_variables in zip(statements, statement_variables):
 			# eksplisiittisesti luodut uudet muuttujat
-			variables.update(stmt.createdVariables())
+			variables.update({**stmt_variables.created_variables, **stmt.whereCreatedVariables()})
 			# uusi-avainsanalla luodut uudet muuttujat
-			new_vars = stmt.newVariables()
+			new_vars = stmt_variables.new_variables
 			for name, vtype in new_vars.items():
-				ans += " "*indent + "var " + escapeIdentifier(name) + " = null;\n"
+				ans.write(" "*indent + "var " + escapeIdentifier(name) + " = null;\n")
 			variables.update(new_vars)
 			# vielä mainitsemattomat muuttujat ovat luodaan (poisluetaan väliaikaismuuttujat)
-			if options["käyttömäärittelyt"]:
-				new_vars = stmt.variables()
-				tmp_vars = stmt.temporaryVariables()
+			if context.options["käyttömäärittelyt"]:
+				new_vars = stmt_variables.variables
+				tmp_vars = stmt_variables.temporary_variables
 				for name, vtype in new_vars.items():
 					if name not in variables and name not in tmp_vars:
 						warning("autodeclaration of " + name + " as " + vtype)
-						ans += " "*indent + "var " + escapeIdentifier(name) + " = new " + escapeIdentifier(vtype) + "({});\n"
+						ans.write(" "*indent + "var " + escapeIdentifier(name) + " = new " + escapeIdentifier(vtype) + "({});\n")
 				variables.update(new_vars)
-			ans += stmt.compile(indent=indent)
+			ans.write(stmt.compile(indent=indent))
 	
-	return ans
+	return ans.getvalue()
 
 # määrittelyjen kääntäminen
 
@@ -160,10 +199,10 @@ class SetOptionDecl(Decl):
 		self.option = option
 		self.statements = []
 	def compileDecl(self):
-		options[self.option] = self.positive
+		compilerContext().options[self.option] = self.positive
 		return ""
 	def buildHierarchy(self):
-		options[self.option] = self.positive
+		compilerContext().options[self.option] = self.positive
 		return ""
 
 class TargetCodeDecl(Decl):
@@ -188,7 +227,8 @@ class IncludeFileDecl(Decl):
 	def compileDecl(self):
 		return ""
 	def buildHierarchy(self):
-		includeFile(self.file)
+		context = compilerContext()
+		context.include_file(self.file, context)
 
 class VariableDecl(Decl):
 	def __init__(self, var, vtype, value, stmts):
@@ -204,7 +244,7 @@ class VariableDecl(Decl):
 		else:
 			return ""
 	def buildHierarchy(self):
-		global_variables[self.var] = self.value.inferType()
+		compilerContext().global_variables[self.var] = self.value.inferType()
 	def validateTree(self):
 		self.value.validateTree()
 
@@ -218,7 +258,7 @@ class ProcedureDecl(Decl):
 			return ("function " + self.signature.compile(semicolon=False)
 				+ " {\n" + compileBlock(self.body, 1, self.signature.variables()) + "};")
 		elif isinstance(self.signature, MethodCallStatement):
-			with BlockFrame(block_frame._replace(self_type=self.signature.obj.type)):
+			with BlockFrame(compilerContext().block_frame._replace(self_type=self.signature.obj.type)):
 				return (
 					typeToJs(self.signature.obj.type) + ".prototype."
 					+ self.signature.compileName()
@@ -233,7 +273,7 @@ class ProcedureDecl(Decl):
 			getClass(self.signature.obj.type).addMethod(self.signature.name, sorted(self.signature.args.keys()))
 	def validateTree(self):
 		if isinstance(self.signature, MethodCallStatement):
-			with BlockFrame(block_frame._replace(self_type=self.signature.obj.type)):
+			with BlockFrame(compilerContext().block_frame._replace(self_type=self.signature.obj.type)):
 				for s in self.body:
 					s.validateTree()
 		else:
@@ -268,7 +308,7 @@ class ClassDecl(Decl):
 		return ans
 	def buildHierarchy(self):
 		cl = Class(self.name, self.super)
-		classes[self.name] = cl
+		addClass(self.name, cl)
 		for name, _, number, _, _, _ in self.fields:
 			cl.addField(name, number)
 
@@ -281,9 +321,9 @@ class TargetCodeClassDecl(Decl):
 		return ""
 	def buildHierarchy(self):
 		cl = Class(self.name, None)
-		classes[self.name] = cl
+		addClass(self.name, cl)
 		if self.name != self.tc_name:
-			aliases[self.name] = self.tc_name
+			compilerContext().aliases[self.name] = self.tc_name
 
 class AliasClassDecl(Decl):
 	def __init__(self, alias_name, real_name, stmts):
@@ -293,17 +333,15 @@ class AliasClassDecl(Decl):
 	def compileDecl(self):
 		return ""
 	def buildHierarchy(self):
-		classes[self.alias_name] = getClass(self.real_name)
-		aliases[self.alias_name] = self.real_name
+		addClass(self.alias_name, getClass(self.real_name))
+		compilerContext().aliases[self.alias_name] = self.real_name
 
 class Whereable:
 	def compileWheres(self, indent=1):
 		return "".join([" "*indent + "var "+escapeIdentifier(name)+" = "+val.compile(indent)+";\n" for name, _, val in self.wheres])
-	def whereSubexpressions(self):
-		ans = []
+	def whereChildren(self):
 		for _, _, val in self.wheres:
-			ans += val.subexpressions()
-		return ans
+			yield val
 	def whereCreatedVariables(self):
 		ans = {}
 		for name, vtype, val in self.wheres:
@@ -336,7 +374,7 @@ class FunctionDecl(Whereable,Decl):
 			ans += " if (this." + escapeIdentifier(self.field) + " !== undefined) return this." + escapeIdentifier(self.field) + ";\n"
 		if self.self_param != "":
 			ans += " var " + escapeIdentifier(self.self_param) + " = this;\n"
-		with BlockFrame(block_frame._replace(self_type=self.type)):
+		with BlockFrame(compilerContext().block_frame._replace(self_type=self.type)):
 			ans += self.compileWheres()
 			if self.memoize:
 				ans += " this." + escapeIdentifier(self.field) + " = " + self.body.compile(0) + ";\n"
@@ -345,9 +383,9 @@ class FunctionDecl(Whereable,Decl):
 				ans += " return " + self.body.compile(0) + ";\n};"
 		return ans
 	def buildHierarchy(self):
-		getClass(self.type).addFunction(self.field, self.param_case, self.body)
+		getClass(self.type).addFunction(self.field, self.param_case, self.body, dict(compilerContext().options))
 	def validateTree(self):
-		with BlockFrame(block_frame._replace(self_type=self.type)):
+		with BlockFrame(compilerContext().block_frame._replace(self_type=self.type)):
 			self.validateWheres()
 			self.body.validateTree()
 
@@ -370,47 +408,75 @@ class CondFunctionDecl(Whereable,Decl):
 	def buildHierarchy(self):
 		getClass(self.type).addComparisonOperator(self.signature.compileName())
 	def validateTree(self):
-		with BlockFrame(block_frame._replace(self_type=self.type)):
+		with BlockFrame(compilerContext().block_frame._replace(self_type=self.type)):
 			self.validateWheres()
 			self.condition.validateTree()
 
 # lauseiden kääntäminen
 
+# Syntaksipuun läpikäynti
+#
+# children palauttaa solmun välittömät alalausekkeet. Alalausekkeet käydään läpi esijärjestyksessä
+# pinon avulla, joten läpikäynnin aika on lineaarinen puun kokoon nähden syvyydestä riippumatta.
+# Solmu itse on mukana alalausekkeissa, ellei se ole lause tai ehto, joka vain kokoaa alalausekkeensa
+# (include_self = False). Tällaisten solmujen omia muuttujia ei kerätä, kun ne ovat toisen solmun
+# sisällä.
+#
+# Muuttujajoukot kerätään yhdellä läpikäynnillä: jokainen alalauseke lisää omat muuttujansa
+# (addOwnVariables) samassa järjestyksessä, jossa ne ovat alalausekkeiden listassa.
+
+VariableSets = namedtuple("VariableSets", "backreferences variables created_variables new_variables temporary_variables")
+
 class Recursive:
+	include_self = True
+	def children(self):
+		return ()
+	def iterSubexpressions(self):
+		stack = [self]
+		while stack:
+			node = stack.pop()
+			if node.include_self:
+				yield node
+			children = list(node.children())
+			children.reverse()
+			stack += children
 	def subexpressions(self):
-		return [self]
-	def search(self, f):
-		ans = []
-		for subexpr in self.subexpressions():
-			if subexpr is not self:
-				ans += f(subexpr)
-		return ans
-	def searchDict(self, f):
-		ans = {}
-		for subexpr in self.subexpressions():
+		return list(self.iterSubexpressions())
+	# alalausekkeiden muuttujat (ei solmun omia)
+	def subexpressionVariables(self):
+		ans = VariableSets([], {}, {}, {}, {})
+		for subexpr in self.iterSubexpressions():
 			if subexpr is not self:
-				ans.update(f(subexpr))
+				subexpr.addOwnVariables(ans)
 		return ans
+	def addOwnVariables(self, ans):
+		pass
+	# lauseen muuttujajoukot, jotka ovat samat kuin alla olevien metodien palauttamat, paitsi että
+	# where-muuttujat puuttuvat luoduista muuttujista, koska niiden tyypit riippuvat aiemmista lauseista
+	def statementVariables(self):
+		return self.subexpressionVariables()
+	def whereCreatedVariables(self):
+		return {}
 	def backreferences(self):
-		return self.search(lambda e: e.backreferences())
+		return self.subexpressionVariables().backreferences
 	# kaikki muuttujat
 	def variables(self):
-		return self.searchDict(lambda e: e.variables())
+		return self.subexpressionVariables().variables
 	# lausekkeissa luodut muuttujat (muuttujaluonti käännetään lausekkeen yhteydessä)
 	def createdVariables(self):
-		return self.searchDict(lambda e: e.createdVariables())
+		return self.subexpressionVariables().created_variables
 	# lausekkeissa luodut muuttujat (muuttujaluonti käännetään ennen lauseketta)
 	def newVariables(self):
-		return self.searchDict(lambda e: e.newVariables())
+		return self.subexpressionVariables().new_variables
 	# väliaikaismuuttujat
 	def temporaryVariables(self):
-		return self.searchDict(lambda e: e.temporaryVariables())
+		return self.subexpressionVariables().temporary_variables
 	# syntaksipuun validoiminen
 	def validateTree(self):
 		self.validate()
-		for e in self.subexpressions():
+		for e in self.iterSubexpressions():
 			if e is not self:
-				e.validateTree()
+				e.validate()
 	def validate(self):
 		pass
 
@@ -419,8 +485,9 @@ class ForStatement(Recursive):
 		self.var = var
 		self.expr = expr
 		self.stmt = stmt
-	def subexpressions(self):
-		return self.expr.subexpressions() + self.stmt.subexpressions()
+	include_self = False
+	def children(self):
+		return (self.expr, self.stmt)
 	def compile(self, indent=0):
 		return (" "*indent
 			+ "for (const " + escapeIdentifier(self.var)
@@ -433,12 +500,10 @@ class IfStatement(Recursive):
 		self.condition = condition
 		self.block = block
 		self.is_else = is_else
-	def subexpressions(self):
-		ans = []
-		ans += self.condition.subexpressions()
-		for s in self.block:
-			ans += s.subexpressions()
-		return ans
+	include_self = False
+	def children(self):
+		yield self.condition
+		yield from self.block
 	def compile(self, indent=0):
 		ans = ""
 		self.condition.compileWheres()
@@ -455,8 +520,11 @@ class QuantifierCondExpr(Whereable,Recursive):
 		self.expr = expr
 		self.cond = cond
 		self.wheres = wheres
-	def subexpressions(self):
-		return self.expr.subexpressions() + self.cond.subexpressions() + self.whereSubexpressions()
+	include_self = False
+	def children(self):
+		yield self.expr
+		yield self.cond
+		yield from self.whereChildren()
 	def createdVariables(self):
 		return {**super().createdVariables(), **self.whereCreatedVariables()}
 	def compile(self, indent):
@@ -469,11 +537,9 @@ class CondConjunctionExpr(Whereable,Recursive):
 		self.op = op
 		self.exprs = exprs
 		self.wheres = []
-	def subexpressions(self):
-		ans = []
-		for expr in self.exprs:
-			ans += expr.subexpressions()
-		return ans
+	include_self = False
+	def children(self):
+		return self.exprs
 	def createdVariables(self):
 		return {**super().createdVariables(), **self.whereCreatedVariables()}
 	def compile(self, indent):
@@ -488,8 +554,12 @@ class CondOperatorExpr(Whereable,Recursive):
 		self.left = left
 		self.right = right
 		self.wheres = wheres
-	def subexpressions(self):
-		return self.left.subexpressions() + (self.right.subexpressions() if self.right else []) + self.whereSubexpressions()
+	include_self = False
+	def children(self):
+		yield self.left
+		if self.right:
+			yield self.right
+		yield from self.whereChildren()
 	def createdVariables(self):
 		return {**super().createdVariables(), **self.whereCreatedVariables()}
 	def getSelfArg(self):
@@ -530,11 +600,11 @@ class CondFunctionExpr(Whereable,Recursive,ArgContainer):
 		self.self_obj = self_obj
 		self.args = args
 		self.wheres = wheres
-	def subexpressions(self):
-		ans = self.self_obj.subexpressions()
-		for arg in self.args.values():
-			ans += arg.subexpressions()
-		return ans + self.whereSubexpressions()
+	include_self = False
+	def children(self):
+		yield self.self_obj
+		yield from self.args.values()
+		yield from self.whereChildren()
 	def createdVariables(self):
 		return {**super().createdVariables(), **self.whereCreatedVariables()}
 	def getSelfArg(self):
@@ -554,11 +624,10 @@ class BlockStatement(Whereable,Recursive):
 	def __init__(self, stmts, wheres):
 		self.stmts = stmts
 		self.wheres = wheres
-	def subexpressions(self):
-		ans = []
-		for s in self.stmts:
-			ans += s.subexpressions()
-		return ans + self.whereSubexpressions()
+	include_self = False
+	def children(self):
+		yield from self.stmts
+		yield from self.whereChildren()
 	def createdVariables(self):
 		return {**super().createdVariables(), **self.whereCreatedVariables()}
 	def compile(self, semicolon=True, indent=0):
@@ -572,15 +641,18 @@ class CallStatement(Recursive,ArgContainer):
 		self.args = args
 		self.output_var = output_var
 		self.async_block = async_block
-	def subexpressions(self):
-		ans = [self]
-		for v in self.args.values():
-			ans += v.subexpressions()
+	def children(self):
+		yield from self.args.values()
 		for _, _, _, s in self.async_block:
-			ans += s.subexpressions()
-		return ans
+			yield s
 	def variables(self):
 		return super().variables()
+	def addOwnVariables(self, ans):
+		ans.created_variables.update(self.createdVariables())
+		ans.temporary_variables.update(self.temporaryVariables())
+	def statementVariables(self):
+		ans = super().statementVariables()
+		return ans._replace(created_variables=self.createdVariables(), temporary_variables=self.temporaryVariables())
 	def createdVariables(self):
 		if self.output_var:
 			return dict([self.output_var])
@@ -599,6 +671,7 @@ class CallStatement(Recursive,ArgContainer):
 	def compileAsync(self, indent):
 		ans = ""
 		for mname, param, ptype, stmt in self.async_block:
+			block_frame = compilerContext().block_frame
 			with BlockFrame(block_frame._replace(variables={**block_frame.variables, **dict([(param, ptype)])})):
 				ans += ("." + escapeIdentifier(mname)
 					+ "(" + escapeIdentifier(param) + " =>\n"
@@ -614,7 +687,7 @@ class CallStatement(Recursive,ArgContainer):
 
 class ProcedureCallStatement(CallStatement):
 	def compile(self, semicolon=True, indent=0):
-		if self.name == "suorittaa!" and list(self.args.keys()) == ["nimento"] and isinstance(self.args["nimento"], StrExpr) and options["kohdekoodi"]:
+		if self.name == "suorittaa!" and list(self.args.keys()) == ["nimento"] and isinstance(self.args["nimento"], StrExpr) and compilerContext().options["kohdekoodi"]:
 			return " "*indent + self.args["nimento"].str + ("\n" if semicolon else "")
 		else:
 			return super().compile(semicolon=semicolon, indent=indent)
@@ -633,8 +706,9 @@ class MethodCallStatement(CallStatement,Recursive):
 		self.args = args
 		self.output_var = output_var
 		self.async_block = async_block
-	def subexpressions(self):
-		return super().subexpressions() + self.obj.subexpressions()
+	def children(self):
+		yield from super().children()
+		yield self.obj
 	def compileName(self):
 		return super().compileName() + "_" + formAbrv(self.obj_case)
 	def compile(self, semicolon=True, indent=0):
@@ -665,14 +739,15 @@ class MethodAssignmentStatement(Recursive):
 		self.method = method
 		self.params = params
 		self.body = body
-	def subexpressions(self):
-		return self.obj.subexpressions() # ei palauta vartalon sisältämiä alalausekkeita (kuten ei lambdakaan)
+	include_self = False
+	def children(self):
+		return (self.obj,) # ei palauta vartalon sisältämiä alalausekkeita (kuten ei lambdakaan)
 	def compileName(self):
 		keys = sorted(self.params.keys())
 		return escapeIdentifier(self.method) + "_" + "".join([formAbrv(form) for form in keys]) + "_" + formAbrv(self.obj_case)
 	def compileParams(self, indent):
 		keys = sorted(self.params.keys())
-		with BlockFrame(block_frame._replace(block_mode=False)):
+		with BlockFrame(compilerContext().block_frame._replace(block_mode=False)):
 			ans = "(" + ", ".join([self.params[key].compile(indent) for key in keys]) + ")"
 		return ans
 	def compile(self, semicolon=True, indent=0):
@@ -688,15 +763,117 @@ class MethodAssignmentStatement(Recursive):
 			ans += ";\n"
 		return ans
 
+# Tyyppipäättely
+#
+# Funktion paluutyyppi on sen lausekkeen tyyppi, joka riippuu lausekkeessa kutsuttujen funktioiden
+# paluutyypeistä. Funktiot voivat kutsua toisiaan rekursiivisesti, joten paluutyypit ratkaistaan
+# kiintopisteiteraatiolla. Kun funktion tyyppiä tarvitaan ensimmäisen kerran, sen lauseke päätellään
+# ja jokainen kohdattu ratkaisematon funktio lisätään työlistaan tyhjällä tyypillä. Samalla muistetaan,
+# mitkä funktiot käyttivät kunkin funktion tyyppiä. Kun funktion tyyppi kasvaa, vain sen käyttäjät
+# päätellään uudelleen. Päättely on monotonista (tyypit vain kasvavat, kun funktioiden tyypit kasvavat),
+# joten iteraatio päättyy pienimpään kiintopisteeseen, joka ei riipu määrittelyjen järjestyksestä.
+#
+# Funktioiden lausekkeet päätellään ilman lohkon muuttujia kuten FunctionDecl.validateTree tekee ja
+# määrittelyn kohdalla voimassa olleilla asetuksilla. Tuloksia ei tallenneta lausekkeisiin, koska
+# keskeneräiset tyypit voivat vielä kasvaa. Lausekkeen tyyppi tallennetaan jokaiselle odotettujen
+# tyyppien joukolle erikseen.
+
+class TypeInference:
+	def __init__(self):
+		# Function -> paluutyyppi
+		self.types = {}
+		# keskeneräisen ratkaisun tila
+		self.solving = False
+		self.pending = None
+		self.dependents = None
+		self.current = None
+		# solmut, joista on jo varoitettu
+		self.warned = set()
+	def functionType(self, f):
+		if f in self.types:
+			return self.types[f]
+		if self.solving:
+			if f not in self.pending:
+				self.pending[f] = ClassSet()
+				self.worklist.append(f)
+				self.queued.add(f)
+			self.dependents.setdefault(f, set()).add(self.current)
+			return self.pending[f]
+		self.solve(f)
+		return self.types[f]
+	def solve(self, f):
+		self.solving = True
+		self.pending = {f: ClassSet()}
+		self.dependents = {}
+		self.worklist = deque([f])
+		self.queued = {f}
+		context = compilerContext()
+		options = context.options
+		try:
+			with BlockFrame(BlockData(None, {}, False, None)):
+				while self.worklist:
+					g = self.worklist.popleft()
+					self.queued.discard(g)
+					self.current = g
+					context.options = g.options
+					try:
+						new_type = self.pending[g] | g.expr.inferType()
+					except TampioError:
+						# virhe ilmoitetaan, kun funktion määrittely validoidaan
+						new_type = self.pending[g]
+					if new_type != self.pending[g]:
+						self.pending[g] = new_type
+						for h in self.dependents.get(g, ()):
+							if h not in self.queued:
+								self.worklist.append(h)
+								self.queued.add(h)
+			self.types.update(self.pending)
+		finally:
+			context.options = options
+			self.solving = False
+			self.pending = self.dependents = self.worklist = self.queued = self.current = None
+	def memberType(self, member, obj_types):
+		# ratkaisun aikana funktioiden tyypit voivat vielä muuttua, joten niitä ei tallenneta
+		if self.solving:
+			return returnTypes(member.functions, obj_types)
+		if obj_types.mask not in member.return_types:
+			member.return_types[obj_types.mask] = returnTypes(member.functions, obj_types)
+		return member.return_types[obj_types.mask]
+	def warnOnce(self, expr):
+		if self.solving or expr in self.warned:
+			return False
+		self.warned.add(expr)
+		return True
+
+def functionType(f):
+	return compilerContext().type_inference.functionType(f)
+
+def returnTypes(functions, obj_types):
+	# niiden funktioiden paluutyypit, joiden luokka voi olla olion tyyppi
+	ans = ClassSet()
+	for f in functions:
+		if f.cl.closure & obj_types.mask:
+			ans |= functionType(f)
+	return ans
+
 # lausekkeiden kääntäminen
 
 class Expr:
 	def __init__(self):
 		self.type_cache = None
-	def inferType(self, expected_types=[]):
-		if self.type_cache is None:
-			self.type_cache = self.infer(expected_types)
-		return self.type_cache
+		self.type_context = None
+	def inferType(self, expected_types=ClassSet()):
+		context = compilerContext()
+		if context.type_inference.solving:
+			return self.infer(expected_types)
+		# inkrementaalinen jäsennin käyttää syntaksipuita uudelleen, joten tyyppi on voimassa vain samassa käännöksessä
+		if self.type_cache is None or self.type_context is not context:
+			self.type_cache = {}
+			self.type_context = context
+		key = expected_types.mask
+		if key not in self.type_cache:
+			self.type_cache[key] = self.infer(expected_types)
+		return self.type_cache[key]
 
 class VariableExpr(Expr,Recursive):
 	def __init__(self, name, vtype=None, initial_value=None, place=None):
@@ -705,11 +882,17 @@ class VariableExpr(Expr,Recursive):
 		self.type = vtype
 		self.initial_value = initial_value
 		self.place = place
-	def subexpressions(self):
+	def children(self):
 		if self.initial_value:
-			return [self] + self.initial_value.subexpressions()
+			return (self.initial_value,)
 		else:
-			return [self]
+			return ()
+	def addOwnVariables(self, ans):
+		ans.variables.update(self.variables())
+		ans.new_variables.update(self.newVariables())
+	def statementVariables(self):
+		ans = super().statementVariables()
+		return ans._replace(variables=self.variables(), new_variables=self.newVariables())
 	def newVariables(self):
 		if self.type and self.initial_value:
 			return {self.name: self.type}
@@ -724,31 +907,36 @@ class VariableExpr(Expr,Recursive):
 		ans = escapeIdentifier(self.name)
 		if self.initial_value:
 			ans = "(" + ans + "=" + self.initial_value.compile(indent) + ")"
-		if self.type in block_frame.backreferences:
+		if self.type in compilerContext().block_frame.backreferences:
 			ans = "(se_" + escapeIdentifier(self.type) + "=" + ans + ")"
 		return ans
 	def infer(self, expected_types):
+		context = compilerContext()
+		block_frame = context.block_frame
 		if block_frame.block_mode and self.name in block_frame.variables:
 			ans = block_frame.variables[self.name]
-		elif self.name in global_variables:
-			ans = global_variables[self.name]
+		elif self.name in context.global_variables:
+			ans = context.global_variables[self.name]
 		elif self.type:
-			ans = set()
+			ans = None
 		else:
 			return classSet()
 		
-		if not ans:
-			ans = set()
-			for i in range(len(self.type)):
-				if isClass(self.type[i:]):
-					ans.add(getClass(self.type[i:]))
+		# lohkon muuttujien arvona on usein luokan nimi eikä luokkajoukko, jolloin luokka päätellään
+		# muuttujan nimestä kuten tuntemattomille muuttujille
+		if not isinstance(ans, ClassSet) or not ans:
+			if not self.type:
+				return classSet()
+			ans = classesOfTypeName(self.type)
 		
 		return ans
 	def validate(self):
+		context = compilerContext()
+		block_frame = context.block_frame
 		if block_frame.block_mode and self.type and not self.initial_value:
 			if self.name not in block_frame.variables:
 				if self.place:
-					notfoundError("variable not found: " + self.name, tokens, self.place)
+					notfoundError("variable not found: " + self.name, context.tokens, self.place)
 				else:
 					notfoundError("variable not found: " + self.name)
 		#if self.type and len(self.infer([])) == 0:
@@ -761,6 +949,11 @@ class BackreferenceExpr(Expr,Recursive):
 		self.may_be_field = may_be_field
 	def backreferences(self):
 		return [self.name]
+	def addOwnVariables(self, ans):
+		ans.backreferences.append(self.name)
+	def statementVariables(self):
+		ans = super().statementVariables()
+		return ans._replace(backreferences=self.backreferences())
 	def compile(self, indent):
 		name = escapeIdentifier(self.name)
 		if self.may_be_field:
@@ -790,12 +983,14 @@ class FieldExpr(Expr,Recursive):
 		self.arg_case = arg_case
 		self.arg = arg
 		self.place = place
-	def subexpressions(self):
-		return [self] + self.obj.subexpressions() + (self.arg.subexpressions() if self.arg else [])
+	def children(self):
+		yield self.obj
+		if self.arg:
+			yield self.arg
 	def isArithmetic(self):
 		return self.field in ARI_OPERATORS and self.arg_case == ARI_OPERATORS[self.field][0]
 	def isTargetCode(self):
-		return self.field == "kohdekoodi_E" and isinstance(self.obj, StrExpr) and options["kohdekoodi"]
+		return self.field == "kohdekoodi_E" and isinstance(self.obj, StrExpr) and compilerContext().options["kohdekoodi"]
 	def compile(self, indent):
 		if self.isArithmetic():
 			return self.compileArithmetic(indent)
@@ -816,39 +1011,36 @@ class FieldExpr(Expr,Recursive):
 			return "(" + self.obj.compile(indent) + operator + self.arg.compile(indent) + ")"
 	def infer(self, expected_types):
 		if self.isArithmetic():
-			return set(map(getClass, ARI_OPERATORS[self.field][2])) or classSet()
+			return classesByName(*ARI_OPERATORS[self.field][2]) or classSet()
 		elif self.isTargetCode():
 			return classSet()
-		functions = [
-			f
-			for f in getFunctions(self.field+"_"+str(self.arg_case))
-			if not expected_types or not f.inferType().isdisjoint(expected_types)
-		]
-		possible_obj_types = set()
-		for f in functions:
-			possible_obj_types.update(f.classes())
-		fields = getFields(self.field) if not self.arg_case else []
-		if fields:
-			for f in fields:
-				possible_obj_types.update(f.classes())
+		member = memberIndex(self.field, self.arg_case)
+		if expected_types:
+			functions = [f for f in member.functions if not functionType(f).isdisjoint(expected_types)]
+			possible_obj_types = member.field_classes
+			for f in functions:
+				possible_obj_types |= f.cl.closure
+		else:
+			functions = member.functions
+			possible_obj_types = member.function_classes | member.field_classes
+		possible_obj_types = ClassSet(possible_obj_types, currentHierarchy().numbered)
 		obj_types = self.obj.inferType(possible_obj_types)
-		for f in fields:
-			if not f.classes().isdisjoint(obj_types):
-				return classSet()
-		ret_types = set()
-		for f in functions:
-			if not f.classes().isdisjoint(obj_types):
-				ret_types.update(f.inferType())
-		if not ret_types:
+		if member.field_classes & obj_types.mask:
+			return classSet()
+		if expected_types:
+			ret_types = returnTypes(functions, obj_types)
+		else:
+			ret_types = compilerContext().type_inference.memberType(member, obj_types)
+		if not ret_types and compilerContext().type_inference.warnOnce(self):
 			warning("unsuccessful inference of " + self.field + ", argument type is illegal: "
 				+ "expected argument to be one of: {" + ", ".join([cl.name for cl in possible_obj_types])
 				+ "}, but it is one of: {" + ", ".join([cl.name for cl in obj_types]) + "}",
-				tokens, self.place, severity="Note")
+				compilerContext().tokens, self.place, severity="Note")
 		return ret_types
 	def validate(self):
 		if len(self.inferType()) == 0:
 			if self.place:
-				typeError("cannot infer the type of expression", tokens, self.place)
+				typeError("cannot infer the type of expression", compilerContext().tokens, self.place)
 			else:
 				typeError("cannot infer the type of expression")
 		
@@ -857,9 +1049,9 @@ class FieldExpr(Expr,Recursive):
 			pass
 		
 		# päätapaus
-		elif len(getFunctions(self.field+"_"+str(self.arg_case)) + (getFields(self.field) if not self.arg_case else [])) == 0:
+		elif memberIndex(self.field, self.arg_case).isEmpty():
 			if self.place:
-				typeError("member not found", tokens, self.place)
+				typeError("member not found", compilerContext().tokens, self.place)
 			else:
 				typeError("member not found")
 
@@ -869,8 +1061,8 @@ class SubscriptExpr(Expr,Recursive):
 		self.obj = obj
 		self.index = index
 		self.is_end_index = is_end_index
-	def subexpressions(self):
-		return [self] + self.obj.subexpressions()
+	def children(self):
+		return (self.obj,)
 	def compile(self, indent):
 		if self.is_end_index:
 			return self.obj.compile(indent) + ".nth_last(" + self.index.compile(indent) + ")"
@@ -885,8 +1077,8 @@ class SliceExpr(Expr,Recursive):
 		self.obj = obj
 		self.start = start
 		self.end = end
-	def subexpressions(self):
-		return [self] + self.obj.subexpressions()
+	def children(self):
+		return (self.obj,)
 	def compile(self, indent):
 		ans = self.obj.compile(indent) + ".slice("
 		ans += self.start.compile(indent) + "-1"
@@ -895,7 +1087,7 @@ class SliceExpr(Expr,Recursive):
 		ans += ")"
 		return ans
 	def infer(self, expected_types):
-		return set([getClass("kohdekoodilista")])
+		return classesByName("kohdekoodilista")
 
 class NumExpr(Expr,Recursive):
 	def __init__(self, num):
@@ -904,7 +1096,7 @@ class NumExpr(Expr,Recursive):
 	def compile(self, indent):
 		return "(" + str(self.num) + ")"
 	def infer(self, expected_types):
-		return set([getClass("luku")])
+		return classesByName("luku")
 
 class StrExpr(Expr,Recursive):
 	def __init__(self, string):
@@ -913,7 +1105,7 @@ class StrExpr(Expr,Recursive):
 	def compile(self, indent):
 		return repr(self.str)
 	def infer(self, expected_types):
-		return set([getClass("merkkijono")])
+		return classesByName("merkkijono")
 
 class NewExpr(Expr,Recursive):
 	def __init__(self, typename, args, variable=None):
@@ -921,11 +1113,14 @@ class NewExpr(Expr,Recursive):
 		self.type = typename
 		self.args = args
 		self.variable = variable
-	def subexpressions(self):
-		ans = []
+	def children(self):
 		for arg in self.args:
-			ans += arg.value.subexpressions()
-		return [self] + ans
+			yield arg.value
+	def addOwnVariables(self, ans):
+		ans.new_variables.update(self.newVariables())
+	def statementVariables(self):
+		ans = super().statementVariables()
+		return ans._replace(new_variables=self.newVariables())
 	def newVariables(self):
 		if self.variable:
 			return {self.variable: self.type}
@@ -933,13 +1128,13 @@ class NewExpr(Expr,Recursive):
 			return {}
 	def compile(self, indent):
 		ans = "new " + typeToJs(self.type) + "({" + ", ".join(["\"" + arg.field + "\": " + arg.value.compile(indent) for arg in self.args]) + "})"
-		if self.type in block_frame.backreferences:
+		if self.type in compilerContext().block_frame.backreferences:
 			ans = "(se_" + escapeIdentifier(self.type) + "=" + ans + ")"
 		if self.variable:
 			ans = "(" + escapeIdentifier(self.variable) + "=" + ans + ")"
 		return ans
 	def infer(self, expected_types):
-		return set([getClass(self.type)])
+		return classesByName(self.type)
 
 class CtorArgExpr:
 	def __init__(self, field, value):
@@ -950,15 +1145,12 @@ class ListExpr(Expr,Recursive):
 	def __init__(self, values):
 		Expr.__init__(self)
 		self.values = values
-	def subexpressions(self):
-		ans = []
-		for val in self.values:
-			ans += val.subexpressions()
-		return [self] + ans
+	def children(self):
+		return self.values
 	def compile(self, indent):
 		return "[" + ", ".join([value.compile(indent) for value in self.values]) + "]"
 	def infer(self, expected_types):
-		return set([getClass("kohdekoodilista")])
+		return classesByName("kohdekoodilista")
 
 class LambdaExpr(Expr,Recursive):
 	def __init__(self, body):
@@ -967,7 +1159,7 @@ class LambdaExpr(Expr,Recursive):
 	def compile(self, indent):
 		return "() => {\n" + compileBlock(self.body, indent+1, {}) + " "*indent + "}"
 	def infer(self, expected_types):
-		return set([getClass("kohdekoodifunktio")])
+		return classesByName("kohdekoodifunktio")
 	# ei alalausekkeita
 
 class TernaryExpr(Expr,Recursive):
@@ -976,10 +1168,8 @@ class TernaryExpr(Expr,Recursive):
 		self.condition = condition
 		self.then = then
 		self.otherwise = otherwise
-	def subexpressions(self):
-		ans = []
-		ans += self.condition.subexpressions()
-		return [self] + ans + self.then.subexpressions() + self.otherwise.subexpressions()
+	def children(self):
+		return (self.condition, self.then, self.otherwise)
 	def compile(self, indent):
 		return ("((" + self.condition.compile(indent)
 			+ ") ? (" + self.then.compile(indent)
@@ -0,0 +1,63 @@
+# Tampio Compiler
+# Copyright (C) 2018 Iikka Hauhio
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Vertailee jokaisen sanan analysointia erikseen lähdekoodin järjestyksessä
+# eräajoon yhdellä ja useammalla säikeellä. Pysyvää välimuistia ei käytetä.
+# Käyttö: python3 benchmarks/analysis.py [sanojen määrä]
+
+import os, random, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from lex import LANGUAGE
+from morphology import AnalysisCache, packAnalyses
+from voikko.inflect_word import WORD_CLASSES, inflect_word
+
+def generateWords(n):
+	rnd = random.Random(0)
+	lemmas = rnd.sample(sorted(WORD_CLASSES), n//10 + 1)
+	forms = []
+	for lemma in lemmas:
+		forms += list(inflect_word(lemma).values())
+	return [rnd.choice(forms) for _ in range(n)]
+
+def timeSerial(words):
+	voikko = AnalysisCache(LANGUAGE).voikkoHandles(1)[0]
+	analyses = {}
+	start = time.perf_counter()
+	for word in words:
+		analyses[word] = voikko.analyze(word)
+	elapsed = time.perf_counter() - start
+	return elapsed, {word: packAnalyses(a) for word, a in analyses.items()}
+
+def timeBatch(words, threads):
+	cache = AnalysisCache(LANGUAGE)
+	cache.voikkoHandles(threads)
+	start = time.perf_counter()
+	cache.analyzeAll(set(words), threads)
+	return time.perf_counter() - start, cache.analyses
+
+def main():
+	n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+	words = generateWords(n)
+	serial, expected = timeSerial(words)
+	print("words: %d, unique: %d" % (n, len(set(words))))
+	print("serial: %.3f s" % serial)
+	for threads in [1, 2, 4, 8]:
+		t, analyses = timeBatch(words, threads)
+		assert analyses == expected
+		print("batch, %d threads: %.3f s (%.1fx)" % (threads, t, serial/t))
+
+if __name__ == "__main__":
+	main()
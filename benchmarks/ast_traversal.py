@@ -0,0 +1,89 @@
+# Tampio Compiler
+# Copyright (C) 2018 Iikka Hauhio
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Luo syvälle sisäkkäisiä lausekkeita ja vertailee lauseen muuttujajoukkojen keräämistä ja
+# syntaksipuun validoimista vanhaan toteutukseen, jossa jokainen alalauseke kokosi alalausekkeidensa
+# listan uudelleen ja jokainen muuttujajoukko kerättiin erikseen.
+# Käyttö: python3 benchmarks/ast_traversal.py [suurin syvyys]
+
+import os, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from ast import (CompilerContext, CompilerFrame, Recursive, ForStatement, CallStatement, VariableExpr,
+	BackreferenceExpr, NewExpr, CtorArgExpr, ListExpr, NumExpr)
+
+METHODS = ["backreferences", "variables", "createdVariables", "newVariables", "temporaryVariables"]
+
+def oldSubexpressions(node):
+	ans = [node] if node.include_self else []
+	for child in node.children():
+		ans += oldSubexpressions(child)
+	return ans
+
+def oldCollect(node, method):
+	if getattr(type(node), method) is not getattr(Recursive, method):
+		return getattr(node, method)()
+	ans = [] if method == "backreferences" else {}
+	for subexpr in oldSubexpressions(node):
+		if subexpr is not node:
+			if method == "backreferences":
+				ans += oldCollect(subexpr, method)
+			else:
+				ans.update(oldCollect(subexpr, method))
+	return ans
+
+def oldValidateTree(node):
+	node.validate()
+	for subexpr in oldSubexpressions(node):
+		if subexpr is not node:
+			oldValidateTree(subexpr)
+
+def nestedStatement(depth):
+	expr = VariableExpr("luku", "luku")
+	for i in range(depth):
+		if i % 2 == 0:
+			expr = ListExpr([expr, BackreferenceExpr("luku"), NumExpr(i)])
+		else:
+			expr = NewExpr("luku", [CtorArgExpr("arvo", expr)], variable="v" + str(i))
+	return ForStatement("x", expr, CallStatement("tulostaa_A", {"nimento": VariableExpr("x")}, ("y", "luku"), []))
+
+def timeIt(f):
+	start = time.perf_counter()
+	f()
+	return time.perf_counter() - start
+
+# vanha toteutus on eksponentiaalinen syvyyteen nähden, joten sitä mitataan vain mataliin puihin asti
+OLD_MAX_DEPTH = 16
+
+def main():
+	max_depth = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+	sys.setrecursionlimit(max(sys.getrecursionlimit(), 10*OLD_MAX_DEPTH))
+	depths = [4, 8, 12, 16, 100, 1000, 10000, 100000]
+	with CompilerFrame(CompilerContext(None), None):
+		for depth in [d for d in depths if d <= max_depth]:
+			stmt = nestedStatement(depth)
+			new_time = timeIt(lambda: stmt.statementVariables() and stmt.validateTree())
+			if depth > OLD_MAX_DEPTH:
+				print("depth %6d: new %8.2f ms" % (depth, new_time*1000))
+				continue
+			old = [oldCollect(stmt, method) for method in METHODS]
+			new = stmt.statementVariables()
+			same = sorted(set(old[0])) == sorted(set(new.backreferences)) and all(
+				list(a.items()) == list(b.items()) for a, b in zip(old[1:], new[1:]))
+			old_time = timeIt(lambda: [oldCollect(stmt, method) for method in METHODS] and oldValidateTree(stmt))
+			print("depth %6d: new %8.2f ms, old %9.2f ms (%.0fx), same variables: %s" % (depth, new_time*1000, old_time*1000, old_time/new_time, same))
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,72 @@
+# Tampio Compiler
+# Copyright (C) 2018 Iikka Hauhio
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Luo moduulin, jossa on suuri luokkahierarkia ja paljon funktiokutsuja, joiden nimisiä funktioita on
+# määritelty usealle luokalle, ja mittaa luokkahierarkian rakentamisen ja koko käännöksen ajan.
+# Tyyppipäättely yhdistää ja leikkaa jokaisen kutsun kohdalla mahdollisten luokkien joukkoja.
+# Käyttö: python3 benchmarks/class_sets.py [luokkien määrä] [kutsujen määrä]
+
+import io, os, sys, time, contextlib
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from ast import (CompilerContext, CompilerFrame, compileModule, ClassDecl, FunctionDecl, VariableExpr,
+	FieldExpr, NumExpr, StrExpr, TernaryExpr)
+
+# kuinka monelle luokalle kukin arvofunktio on määritelty ja montako kutsua kussakin funktiossa on
+SHARED = 10
+CALLS_PER_FUNCTION = 10
+
+def module(n, calls):
+	classes = [ClassDecl("luku", [], []), ClassDecl("merkkijono", [], [])]
+	classes += [ClassDecl("luokka" + str(i), [], [], "luokka" + str((i-1)//2) if i > 0 else None) for i in range(n)]
+	functions = []
+	names = n // SHARED
+	for i in range(n):
+		body = NumExpr(i) if i % 3 else StrExpr(str(i))
+		functions.append(FunctionDecl("luokka" + str(i), "arvo" + str(i % names) + "_E", "", None, None, body, [], False, []))
+	for i in range(calls // CALLS_PER_FUNCTION):
+		body = NumExpr(0)
+		for j in range(CALLS_PER_FUNCTION):
+			k = (i*CALLS_PER_FUNCTION + j) * 7919
+			call = FieldExpr(VariableExpr("olio", "luokka" + str(k % n)), "arvo" + str(k % names) + "_E")
+			body = TernaryExpr(NumExpr(j), call, body)
+		functions.append(FunctionDecl("luokka" + str(i % n), "kutsu" + str(i) + "_E", "", None, None, body, [], False, []))
+	return classes, functions
+
+def compileAll(classes, functions):
+	context = CompilerContext(None)
+	errors = []
+	with contextlib.redirect_stderr(io.StringIO()) as stderr:
+		start = time.perf_counter()
+		with CompilerFrame(context, None):
+			for decl in classes + functions:
+				decl.buildHierarchy()
+		hierarchy = time.perf_counter() - start
+		start = time.perf_counter()
+		compileModule(classes + functions, errors.append, None, CompilerContext(None))
+		total = time.perf_counter() - start
+	return hierarchy, total, len(errors), stderr.getvalue().count("unsuccessful inference")
+
+def main():
+	n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+	calls = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+	classes, functions = module(n, calls)
+	results = [compileAll(classes, functions) for _ in range(3)]
+	hierarchy, total, errors, notes = min(results, key=lambda r: r[1])
+	print("%d classes, %d calls: hierarchy %.1f ms, compilation %.1f ms, %d errors, %d inference notes"
+		% (n, calls, hierarchy*1000, total*1000, errors, notes))
+
+if __name__ == "__main__":
+	main()
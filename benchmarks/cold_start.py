@@ -0,0 +1,46 @@
+# Tampio Compiler
+# Copyright (C) 2018 Iikka Hauhio
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Mittaa taivutustaulukoiden lataamisen sanalistasta ja .aff-tiedostoista verrattuna
+# valmiiksi käännettyyn tilannevedokseen sekä koko kääntäjän käynnistymisajan (tampio.py -v).
+# Käyttö: python3 benchmarks/cold_start.py [toistojen määrä]
+
+import os, subprocess, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import voikko.inflect_word as inflect_word
+
+TAMPIO = os.path.join(os.path.dirname(__file__), "..", "tampio.py")
+
+def best(f, n):
+	times = []
+	for _ in range(n):
+		start = time.perf_counter()
+		f()
+		times.append(time.perf_counter() - start)
+	return min(times)
+
+def main():
+	n = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+	inflect_word.build_snapshot()
+	parse = best(inflect_word.read_tables, n)
+	snapshot = best(lambda: inflect_word.load_snapshot(inflect_word.source_hash()), n)
+	print("parse sources: %.1f ms" % (parse*1000))
+	print("load snapshot: %.1f ms (%.1fx)" % (snapshot*1000, parse/snapshot))
+	startup = best(lambda: subprocess.run([sys.executable, TAMPIO, "-v"], stdout=subprocess.DEVNULL, check=True), n)
+	print("tampio.py -v: %.1f ms" % (startup*1000))
+
+if __name__ == "__main__":
+	main()
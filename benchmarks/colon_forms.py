@@ -0,0 +1,62 @@
+# Tampio Compiler
+# Copyright (C) 2018 Iikka Hauhio
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Vertailee kaksoispisteellä taivutettujen literaalien vanhaa ja uutta tunnistusta.
+# Käyttö: python3 benchmarks/colon_forms.py [tokenien määrä]
+
+import os, random, re, sys, timeit
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from inflect import CASES_A, CASES_F, CASES_ELLIPSI, CASE_REGEXES, ORDINAL_CASE_REGEXES, colonForm
+
+ORDINAL_SUFFIXES = [":s", ":nnen", ":ttä", ":nneksi", ":nnelle", ":nnellä", ":nneltä", ":nteen", ":nnessä", ":nnestä", ":nnettä", ":nnesti"]
+PLURAL_SUFFIXES = [":ien", ":ia", ":inä", ":iksi", ":ille", ":illa", ":ilta", ":iin", ":issa", ":ista", ":itta", ":in", ":ineen"]
+
+def generateTokens(n):
+	rnd = random.Random(0)
+	suffixes = list(CASES_A.values()) + list(CASES_F.values()) + list(CASES_ELLIPSI.values()) + ORDINAL_SUFFIXES + PLURAL_SUFFIXES
+	bases = ["x", "y", "n", "2", "10", "i"]
+	words = ["luku", "on", "kiva", "jokainen"]
+	tokens = []
+	for _ in range(n):
+		if rnd.random() < 0.2:
+			tokens.append(rnd.choice(words))
+		else:
+			tokens.append(rnd.choice(bases) + rnd.choice(suffixes))
+	return tokens
+
+def oldColonForm(word):
+	for number in CASE_REGEXES:
+		for case in CASE_REGEXES[number]:
+			if re.fullmatch(CASE_REGEXES[number][case], word):
+				return (case, number, False)
+	for case in ORDINAL_CASE_REGEXES:
+		if re.fullmatch(ORDINAL_CASE_REGEXES[case], word):
+			return (case, "", True)
+	return None
+
+def main():
+	n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+	tokens = generateTokens(n)
+	for token in tokens:
+		assert oldColonForm(token) == colonForm(token), token
+	old = timeit.timeit(lambda: [oldColonForm(t) for t in tokens], number=1)
+	new = timeit.timeit(lambda: [colonForm(t) for t in tokens], number=1)
+	print("tokens: %d" % n)
+	print("old: %.3f s" % old)
+	print("new: %.3f s (%.1fx)" % (new, old/new))
+
+if __name__ == "__main__":
+	main()
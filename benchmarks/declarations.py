@@ -0,0 +1,58 @@
+# Tampio Compiler
+# Copyright (C) 2018 Iikka Hauhio
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Jäsentää generoidun moduulin, jossa on tuhansia funktiomäärittelyjä, ja vertailee
+# afterCommaThereIs-funktion vanhaa (seuraavaan pilkkuun asti etsivää) toteutusta uuteen.
+# Käyttö: python3 benchmarks/declarations.py [määrittelyjen määrä]
+
+import os, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from lex import lexCode
+import grammar
+
+FUNCTION = "Vektorin summa on sen pää lisättynä sen hännän summaan.\n"
+PROCEDURE = "Kun lyhyt vektori järjestetään,\n\tsen komponentit järjestetään.\n"
+
+def scanningAfterCommaThereIs(word, tokens):
+	i = 1
+	while tokens.peek(i) and tokens.peek(i).token not in [",", "."]:
+		i += 1
+	return tokens.peek(i) and tokens.peek(i).token == "," and tokens.peek(i+1) and tokens.peek(i+1).token.lower() == word
+
+def timeParse(tokens):
+	context = grammar.ParserContext()
+	tokens.setPlace(-1)
+	start = time.perf_counter()
+	n = 0
+	while not tokens.eof():
+		grammar.parseDeclaration(tokens, context)
+		n += 1
+	return time.perf_counter() - start, n
+
+def main():
+	n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+	tokens = lexCode("Vektorilla on komponentit.\n" + (FUNCTION*4 + PROCEDURE)*(n//5))
+	indexed = grammar.afterCommaThereIs
+	grammar.afterCommaThereIs = scanningAfterCommaThereIs
+	old, decls = timeParse(tokens)
+	grammar.afterCommaThereIs = indexed
+	new, _ = timeParse(tokens)
+	print("declarations: %d, tokens: %d" % (decls, len(tokens.tokens)))
+	print("scanning: %.3f s" % old)
+	print("indexed: %.3f s (%.2fx)" % (new, old/new))
+
+if __name__ == "__main__":
+	main()
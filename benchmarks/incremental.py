@@ -0,0 +1,71 @@
+# Tampio Compiler
+# Copyright (C) 2018 Iikka Hauhio
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Simuloi editoria: kirjoittaa uuden määrittelyn merkki kerrallaan tiedoston keskelle ja jäsentää
+# koodin jokaisen merkin jälkeen sekä kokonaan uudelleen että IncrementalParserilla.
+# Käyttö: python3 benchmarks/incremental.py [tiedosto]
+
+import os, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from lex import lexCode
+from grammar import ParserContext, parseDeclaration
+from fatal_error import TampioSyntaxError
+from incremental import IncrementalParser
+
+TYPED = "Luvun kolmasosa on se jaettuna kolmella.\n"
+
+def parseFully(code):
+	tokens = lexCode(code)
+	context = ParserContext()
+	decls = []
+	while not tokens.eof():
+		try:
+			decls.append(parseDeclaration(tokens, context))
+		except TampioSyntaxError:
+			while not tokens.eof() and tokens.next().token != ".":
+				pass
+	return tokens, decls
+
+def main():
+	filename = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(__file__), "..", "std.itp")
+	with open(filename) as f:
+		code = f.read()
+	# kirjoitetaan keskimmäisen määrittelyn jälkeen
+	middle = code.index(".\n", len(code)//2) + 2
+	versions = [code[:middle] + TYPED[:i] + code[middle:] for i in range(len(TYPED)+1)]
+
+	start = time.perf_counter()
+	for version in versions:
+		full_tokens, full_decls = parseFully(version)
+	full = time.perf_counter() - start
+
+	parser = IncrementalParser()
+	parser.update(versions[0])
+	changed = 0
+	start = time.perf_counter()
+	for version in versions[1:]:
+		tokens, decls, changed_decls = parser.update(version)
+		changed += len(changed_decls)
+	incremental = time.perf_counter() - start
+
+	same = tokens.styles == full_tokens.styles and len(decls) == len(full_decls)
+	print("keystrokes: %d, declarations: %d, reparsed per keystroke: %.1f" % (len(versions)-1, len(decls), changed/(len(versions)-1)))
+	print("full reparse: %.2f ms per keystroke" % (full/len(versions)*1000))
+	print("incremental: %.2f ms per keystroke (%.1fx)" % (incremental/(len(versions)-1)*1000, full/len(versions)/(incremental/(len(versions)-1))))
+	print("same result: %s" % same)
+
+if __name__ == "__main__":
+	main()
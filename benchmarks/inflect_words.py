@@ -0,0 +1,39 @@
+# Tampio Compiler
+# Copyright (C) 2018 Iikka Hauhio
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Taivuttaa jokaisen sanat.txt-tiedoston sanan kaikkiin muotoihin.
+# Käyttö: python3 benchmarks/inflect_words.py [tulostiedosto]
+# Jos tulostiedosto annetaan, taivutusmuodot kirjoitetaan siihen vertailua varten.
+
+import os, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from voikko.inflect_word import WORD_CLASSES, inflect_word
+
+def main():
+	words = sorted(WORD_CLASSES)
+	start = time.perf_counter()
+	paradigms = [inflect_word(word, WORD_CLASSES[word]) for word in words]
+	elapsed = time.perf_counter() - start
+	forms = sum(len(p) for p in paradigms)
+	print("words: %d, forms: %d" % (len(words), forms))
+	print("time: %.3f s (%.1f µs/word)" % (elapsed, elapsed/len(words)*1e6))
+	if len(sys.argv) > 1:
+		with open(sys.argv[1], "w") as f:
+			for word, paradigm in zip(words, paradigms):
+				f.write(word + "\t" + repr(sorted(paradigm.items())) + "\n")
+
+if __name__ == "__main__":
+	main()
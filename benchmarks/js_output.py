@@ -0,0 +1,84 @@
+# Tampio Compiler
+# Copyright (C) 2018 Iikka Hauhio
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Kääntää suuren generoidun moduulin ja vertailee vanhaa toteutusta, joka liitti määrittelyjen
+# koodin yhdeksi merkkijonoksi, JSWriteriin kerättävään ja suoraan tiedostoon kirjoitettavaan
+# koodiin: kuinka kauan kääntäminen kestää ja kuinka paljon muistia se vie enimmillään.
+# Käyttö: python3 benchmarks/js_output.py [määrittelyjen määrä]
+
+import io, os, sys, time, tracemalloc, contextlib
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from ast import (CompilerContext, CompilerFrame, JSWriter, compileModule, ClassDecl, FunctionDecl, VariableExpr,
+	FieldExpr, NumExpr, StrExpr, TernaryExpr)
+from fatal_error import TampioError
+
+def module(n):
+	decls = [ClassDecl("luku", [], []), ClassDecl("merkkijono", [], []), ClassDecl("olio", [], [])]
+	for i in range(n):
+		body = StrExpr("arvo " * 20 + str(i))
+		for j in range(5):
+			body = TernaryExpr(FieldExpr(VariableExpr("olio", "olio"), "arvo" + str(max(i-j-1, 0)) + "_E"), NumExpr(j), body)
+		decls.append(FunctionDecl("olio", "arvo" + str(i) + "_E", "", None, None, body, [], False, []))
+	return decls
+
+def oldCompileModule(declarations, on_error, tokens, context):
+	with CompilerFrame(context, tokens):
+		for decl in declarations:
+			try:
+				decl.buildHierarchy()
+			except TampioError as e:
+				on_error(e)
+	with CompilerFrame(context, tokens):
+		ans = ""
+		additional_statements = ""
+		for decl in declarations:
+			try:
+				decl.validateTree()
+				ans += decl.compile() + "\n"
+				additional_statements += decl.compileAdditionalStatements()
+			except TampioError as e:
+				on_error(e)
+		return ans + additional_statements
+
+def oldString(decls, stream):
+	stream.write(oldCompileModule(decls, print, None, CompilerContext(None)))
+
+def writer(decls, stream):
+	stream.write(compileModule(decls, print, None, CompilerContext(None)))
+
+def streaming(decls, stream):
+	compileModule(decls, print, None, CompilerContext(None), JSWriter(stream))
+
+def measure(compile, decls):
+	with open(os.devnull, "w") as stream, contextlib.redirect_stderr(io.StringIO()):
+		start = time.perf_counter()
+		compile(decls, stream)
+		elapsed = time.perf_counter() - start
+		tracemalloc.start()
+		compile(decls, stream)
+		peak = tracemalloc.get_traced_memory()[1]
+		tracemalloc.stop()
+	return elapsed, peak
+
+def main():
+	n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+	decls = module(n)
+	for name, compile in [("old string", oldString), ("JSWriter", writer), ("streaming", streaming)]:
+		elapsed, peak = measure(compile, decls)
+		print("%s: %.1f ms, peak memory %.1f MB" % (name, elapsed*1000, peak/1e6))
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,75 @@
+# Tampio Compiler
+# Copyright (C) 2018 Iikka Hauhio
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Jäsentää std.itp:n ja esimerkit ennakointifunktioiden muistin kanssa ja ilman sitä,
+# ja tulostaa, kuinka monta kertaa kutakin funktiota kutsuttiin ja kuinka monta tulosta saatiin muistista.
+# Käyttö: python3 benchmarks/lookahead.py [toistojen määrä]
+
+import glob, os, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from fatal_error import TampioSyntaxError
+from lex import lexCode
+import grammar
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+def parseAll(tokens, context):
+	tokens.setPlace(-1)
+	while not tokens.eof():
+		try:
+			grammar.parseDeclaration(tokens, context)
+		except TampioSyntaxError:
+			while not tokens.eof() and tokens.next().token != ".":
+				pass
+
+def timeParse(token_lists, memoize, repeats):
+	grammar.MEMOIZE_LOOKAHEAD = memoize
+	best = None
+	for _ in range(repeats):
+		contexts = []
+		start = time.perf_counter()
+		for tokens in token_lists:
+			contexts.append(grammar.ParserContext())
+			parseAll(tokens, contexts[-1])
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+	return best, contexts
+
+def main():
+	repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+	files = [os.path.join(ROOT, "std.itp")] + sorted(glob.glob(os.path.join(ROOT, "examples", "*.itp")))
+	token_lists = []
+	for filename in files:
+		with open(filename) as f:
+			token_lists.append(lexCode(f.read()))
+	# lämmitetään välimuistit ennen mittausta
+	timeParse(token_lists, False, 1)
+	plain, _ = timeParse(token_lists, False, repeats)
+	memoized, contexts = timeParse(token_lists, True, repeats)
+	stats = {}
+	for context in contexts:
+		for name, (hits, misses) in context.lookahead_stats.items():
+			total = stats.setdefault(name, [0, 0])
+			total[0] += hits
+			total[1] += misses
+	for name in sorted(stats):
+		hits, misses = stats[name]
+		print("%s: %d calls, %d from memo (%.0f%%)" % (name, hits+misses, hits, 100*hits/(hits+misses)))
+	print("without memo: %.3f s" % plain)
+	print("with memo: %.3f s (%.2fx)" % (memoized, plain/memoized))
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,74 @@
+# Tampio Compiler
+# Copyright (C) 2018 Iikka Hauhio
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Jäsentää esimerkit moninkertaisena peräkkäin ja rinnakkain eri prosessimäärillä
+# ja tarkistaa, että tulokset ovat samat.
+# Käyttö: python3 benchmarks/parallel_parse.py [kerroin] [prosessimäärät...]
+
+import glob, io, os, pickle, sys, time, contextlib
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from fatal_error import TampioSyntaxError
+from lex import lexCode, TokenList
+from grammar import ParserContext, parseDeclaration
+import parallel
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+def parseSerial(tokens):
+	decls = []
+	context = ParserContext()
+	while not tokens.eof():
+		try:
+			decls.append(parseDeclaration(tokens, context))
+		except TampioSyntaxError as e:
+			e.printMe(sys.stderr)
+			while not tokens.eof() and tokens.next().token != ".":
+				pass
+	return decls
+
+def parseParallel(tokens, processes):
+	return parallel.parseDeclarationsInParallel(tokens, ParserContext(), processes, lambda e: e.printMe(sys.stderr))
+
+def timeParse(token_list, f, *args):
+	tokens = TokenList(token_list)
+	err = io.StringIO()
+	start = time.perf_counter()
+	with contextlib.redirect_stderr(err):
+		decls = f(tokens, *args)
+	elapsed = time.perf_counter() - start
+	return elapsed, ([pickle.dumps(decl) for decl in decls], tokens.styles, tokens.style_spans, tokens.newlines, tokens.indent_levels, err.getvalue())
+
+def main():
+	scale = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+	process_counts = [int(n) for n in sys.argv[2:]] or [2, 4, 8]
+	code = ""
+	for filename in sorted(glob.glob(os.path.join(ROOT, "examples", "*.itp"))):
+		with open(filename) as f:
+			code += f.read() + "\n"
+	token_list = lexCode(code*scale).tokens
+	tokens = TokenList(token_list)
+	spans = parallel.declarationSpans(tokens)
+	results = parallel.parseSpansInParallel(tokens, spans, process_counts[0])
+	print("lines: %d, declarations: %d, reparsed serially: %d" % ((code*scale).count("\n"), len(spans), results.count(None)))
+	serial, expected = timeParse(token_list, parseSerial)
+	print("serial: %.3f s" % serial)
+	for processes in process_counts:
+		t, result = timeParse(token_list, parseParallel, processes)
+		assert result == expected
+		print("%d processes: %.3f s (%.2fx)" % (processes, t, serial/t))
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,72 @@
+# Tampio Compiler
+# Copyright (C) 2018 Iikka Hauhio
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Kirjoittaa suuren generoidun tiedoston ja vertailee sen lukemista kokonaan (lexCode) ja paloittain
+# (lexFile): kuinka kauan ensimmäisen määrittelyn jäsentämiseen kuluu ja kuinka paljon muistia
+# tokenisointi ja jäsentäminen vievät enimmillään.
+# Käyttö: python3 benchmarks/streaming_lexer.py [määrittelyjen määrä]
+
+import os, sys, tempfile, time, tracemalloc
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from lex import lexCode, lexFile
+from grammar import ParserContext, parseDeclaration
+
+FUNCTION = "Vektorin summa on sen pää lisättynä sen hännän summaan.\n"
+PROCEDURE = "Kun lyhyt vektori järjestetään,\n\tsen komponentit järjestetään.\n"
+
+def readWhole(filename):
+	with open(filename) as f:
+		return lexCode(f.read())
+
+def readStreaming(filename):
+	f = open(filename)
+	return lexFile(f)
+
+def timeFirstDeclaration(read, filename):
+	start = time.perf_counter()
+	tokens = read(filename)
+	parseDeclaration(tokens, ParserContext())
+	return time.perf_counter() - start
+
+def peakMemory(read, filename):
+	tracemalloc.start()
+	tokens = read(filename)
+	context = ParserContext()
+	decls = []
+	while not tokens.eof():
+		decls.append(parseDeclaration(tokens, context))
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return peak, len(decls)
+
+def main():
+	n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+	with tempfile.NamedTemporaryFile("w", suffix=".itp", delete=False) as f:
+		f.write("Vektorilla on komponentit.\n" + (FUNCTION*4 + PROCEDURE)*(n//5))
+		filename = f.name
+	try:
+		# analysoidaan sanat etukäteen, jotta Voikko ei vaikuta mittauksiin
+		readWhole(filename)
+		print("file size: %d kB" % (os.path.getsize(filename)//1024))
+		for name, read in [("whole file", readWhole), ("streaming", readStreaming)]:
+			first = timeFirstDeclaration(read, filename)
+			peak, decls = peakMemory(read, filename)
+			print("%s: first declaration after %.1f ms, peak memory %.1f MB (%d declarations)" % (name, first*1000, peak/1e6, decls))
+	finally:
+		os.remove(filename)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,76 @@
+# Tampio Compiler
+# Copyright (C) 2018 Iikka Hauhio
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Vertailee TokenListin indeksoitua peek/next-toteutusta vanhaan lineaariseen toteutukseen
+# jäsentämällä examples/talo.itp-tiedoston moninkertaisena.
+# Käyttö: python3 benchmarks/token_list.py [kerroin]
+
+import io, os, sys, time, contextlib
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from fatal_error import TampioSyntaxError
+from lex import lexCode, TokenList
+from grammar import ParserContext, parseDeclaration
+
+class LinearTokenList(TokenList):
+	def peek(self, n=1):
+		j = self.i+1
+		while j < len(self.tokens):
+			if self.tokens[j].isWord() or not self.tokens[j].isSpace():
+				n -= 1
+				if n == 0:
+					return self.tokens[j]
+			j += 1
+		return None
+	def next(self):
+		while self.i < len(self.tokens):
+			self.i += 1
+			self.indent_levels[self.i] = self.indent_level
+			if self.tokens[self.i].isWord() or not self.tokens[self.i].isSpace():
+				return self.tokens[self.i]
+		return None
+
+def parseAll(tokens):
+	context = ParserContext()
+	n = 0
+	while not tokens.eof():
+		try:
+			parseDeclaration(tokens, context)
+		except TampioSyntaxError:
+			while not tokens.eof() and tokens.next().token != ".":
+				pass
+		n += 1
+	return n
+
+def timeParse(cls, token_list):
+	tokens = cls(token_list)
+	start = time.perf_counter()
+	n = parseAll(tokens)
+	return time.perf_counter() - start, n
+
+def main():
+	scale = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+	with open(os.path.join(os.path.dirname(__file__), "..", "examples", "talo.itp")) as f:
+		code = f.read()*scale
+	token_list = lexCode(code).tokens
+	with contextlib.redirect_stderr(io.StringIO()):
+		old, n = timeParse(LinearTokenList, token_list)
+		new, _ = timeParse(TokenList, token_list)
+	print("tokens: %d, declarations: %d" % (len(token_list), n))
+	print("linear: %.3f s" % old)
+	print("indexed: %.3f s (%.1fx)" % (new, old/new))
+
+if __name__ == "__main__":
+	main()
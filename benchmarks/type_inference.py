@@ -0,0 +1,66 @@
+# Tampio Compiler
+# Copyright (C) 2018 Iikka Hauhio
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Luo moduulin, jossa on suuri luokkahierarkia ja toisiaan rekursiivisesti kutsuvia funktioita, ja
+# kääntää sen kiintopisteiteraatiolla sekä vanhalla rekursiivisella päättelyllä, jossa funktion tyyppi
+# on rekursion aikana tyhjä. Tulostaa käännösajan ja tyyppivirheiden määrän kahdessa määrittelyjärjestyksessä.
+# Käyttö: python3 benchmarks/type_inference.py [luokkien määrä]
+
+import io, os, sys, time, contextlib
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from ast import (CompilerContext, TypeInference, ClassSet, compileModule, ClassDecl, FunctionDecl, VariableExpr,
+	FieldExpr, NumExpr, TernaryExpr)
+
+class RecursiveInference(TypeInference):
+	def functionType(self, f):
+		if f not in self.types:
+			self.types[f] = ClassSet()
+			self.types[f] = f.expr.inferType()
+		return self.types[f]
+
+def call(i):
+	return FieldExpr(VariableExpr("olio", "luokka" + str(i)), "arvo" + str(i) + "_E")
+
+def module(n):
+	classes = [ClassDecl("luku", [], [])]
+	classes += [ClassDecl("luokka" + str(i), [], [], "luokka" + str((i-1)//2) if i > 0 else None) for i in range(n)]
+	functions = []
+	for i in range(n):
+		# ensimmäinen funktio palauttaa luvun, muut kutsuvat kahta muuta funktiota
+		body = NumExpr(i) if i == 0 else TernaryExpr(NumExpr(0), call((i+1) % n), call((i*7+3) % n))
+		functions.append(FunctionDecl("luokka" + str(i), "arvo" + str(i) + "_E", "", None, None, body, [], False, []))
+	return classes, functions
+
+def compileWith(inference_class, classes, functions):
+	context = CompilerContext(None)
+	context.type_inference = inference_class()
+	errors = []
+	start = time.perf_counter()
+	with contextlib.redirect_stderr(io.StringIO()):
+		compileModule(classes + functions, errors.append, None, context)
+	return time.perf_counter() - start, len(errors)
+
+def main():
+	n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+	sys.setrecursionlimit(max(sys.getrecursionlimit(), 20*n))
+	classes, functions = module(n)
+	for name, inference_class in [("recursive", RecursiveInference), ("fixed point", TypeInference)]:
+		for order, decls in [("forward", functions), ("reversed", functions[::-1])]:
+			elapsed, errors = compileWith(inference_class, classes, decls)
+			print("%s, %s order: %.1f ms, %d type errors" % (name, order, elapsed*1000, errors))
+
+if __name__ == "__main__":
+	main()
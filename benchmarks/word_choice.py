@@ -0,0 +1,91 @@
+# Tampio Compiler
+# Copyright (C) 2018 Iikka Hauhio
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+# Jäsentää std.itp:n ja esimerkit sekä vanhalla, tulkinnat jokaisella kutsulla järjestävällä
+# toWord-metodilla että uudella, ja tarkistaa, että molemmat valitsevat joka kutsulla saman tulkinnan.
+# Käyttö: python3 benchmarks/word_choice.py [toistojen määrä]
+
+import glob, os, sys, time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from fatal_error import TampioSyntaxError
+from lex import lexCode, AltWords
+import grammar
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+def sortingToWord(self, cls=[], forms=[], numbers=[]):
+	def score(w):
+		return (cls.count(w.word_class)
+			+ forms.count(w.form)
+			+ forms.count(w.comparison)
+			+ numbers.count(w.number)
+			+ (-2 if w.form == "keinonto" and "nimisana" in cls else 0))
+	return sorted(self.alternatives, key=score)[-1]
+
+def parseAll(token_lists):
+	for tokens in token_lists:
+		tokens.setPlace(-1)
+		context = grammar.ParserContext()
+		while not tokens.eof():
+			try:
+				grammar.parseDeclaration(tokens, context)
+			except TampioSyntaxError:
+				while not tokens.eof() and tokens.next().token != ".":
+					pass
+
+def timeParse(token_lists, to_word, repeats):
+	AltWords.toWord = to_word
+	best = None
+	for _ in range(repeats):
+		for tokens in token_lists:
+			for token in tokens.tokens:
+				if isinstance(token, AltWords):
+					token.choices = None
+		start = time.perf_counter()
+		parseAll(token_lists)
+		elapsed = time.perf_counter() - start
+		best = elapsed if best is None else min(best, elapsed)
+	return best
+
+def recordChoices(token_lists, to_word):
+	choices = []
+	def recordingToWord(self, *args, **kwargs):
+		word = to_word(self, *args, **kwargs)
+		choices.append(word)
+		return word
+	AltWords.toWord = recordingToWord
+	parseAll(token_lists)
+	return choices
+
+def main():
+	repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+	files = [os.path.join(ROOT, "std.itp")] + sorted(glob.glob(os.path.join(ROOT, "examples", "*.itp")))
+	token_lists = []
+	for filename in files:
+		with open(filename) as f:
+			token_lists.append(lexCode(f.read()))
+	cached_to_word = AltWords.toWord
+	old_choices = recordChoices(token_lists, sortingToWord)
+	new_choices = recordChoices(token_lists, cached_to_word)
+	same = len(old_choices) == len(new_choices) and all(a is b for a, b in zip(old_choices, new_choices))
+	print("toWord calls: %d, same choices: %s" % (len(new_choices), same))
+	old = timeParse(token_lists, sortingToWord, repeats)
+	new = timeParse(token_lists, cached_to_word, repeats)
+	print("sorting: %.3f s" % old)
+	print("feature codes: %.3f s (%.2fx)" % (new, old/new))
+
+if __name__ == "__main__":
+	main()
@@ -16,6 +16,7 @@
 
 import pygame
 from tampio import compileCode
+from incremental import IncrementalParser
 
 WIDTH = 1600
 HEIGHT = 800
@@ -50,8 +51,11 @@ STYLES = {
 	"type": "small-caps"
 }
 
+# koodi käännetään uudelleen jokaisen muutoksen jälkeen, joten jäsennetään vain muuttuneet määrittelyt
+parser = IncrementalParser()
+
 def make_tokens(code):
-	tl, _, _ = compileCode(code)
+	tl, _, _ = compileCode(code, incremental_parser=parser)
 	tokens = []
 	line = []
 	for token, style in zip(tl.tokens, tl.styles):
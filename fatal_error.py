@@ -14,7 +14,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-import sys
+import json, sys
+from collections import namedtuple
 
 def fatalError(msg):
 	sys.stderr.write(msg + "\n")
@@ -23,6 +24,12 @@ def fatalError(msg):
 class StopEvaluation(Exception):
 	pass
 
+# virheen viesti, tokenin indeksi sekä tokenin alun rivi ja sarake (alkavat ykkösestä)
+ErrorRecord = namedtuple("ErrorRecord", ["message", "place", "line", "column"])
+
+def writeErrorsJSON(records, stream):
+	stream.write(json.dumps([record._asdict() for record in records], ensure_ascii=False) + "\n")
+
 class TampioError(Exception):
 	def __init__(self, msg, tokens=None, place=None):
 		self.msg = msg
@@ -33,6 +40,12 @@ class TampioError(Exception):
 			stream.write(self.msg + "\n" + self.tokens.fancyContext(self.place) + "\n")
 		else:
 			stream.write(self.msg + "\n")
+	def record(self):
+		# kevyt virhetietue, jonka luominen ei muotoile virheen kontekstia
+		if self.tokens and self.place is not None and self.place >= 0:
+			line, column = self.tokens.position(self.place)
+			return ErrorRecord(self.msg, self.place, line, column)
+		return ErrorRecord(self.msg, self.place, None, None)
 	def __str__(self):
 		if self.tokens  and self.place:
 			return "Syntax error: " + self.msg + " (in \"" + self.tokens.context(self.place) + "\")"
@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 import sys
+import threading
 from itertools import chain
 from collections import namedtuple
 
@@ -21,15 +22,65 @@ from fatal_error import syntaxError
 from inflect import *
 
 from ast import *
-from lex import accept, checkEof, eat, eatComma, eatPeriod, afterCommaThereIs, ADJ, NOUN, NAME, PRONOUN, NUMERAL, VERB, CONJ, CARDINALS, ORDINALS
+from lex import TokenList, accept, checkEof, eat, eatComma, eatPeriod, afterCommaThereIs, ADJ, NOUN, NAME, PRONOUN, NUMERAL, VERB, CONJ, CARDINALS, ORDINALS
 
-def initializeParser():
-	global options, current_class
-	options = {
-		"kohdekoodi": False,
-		"takaisinviittaukset": False
-	}
-	current_class = None
+# jäsentimen tila
+#
+# Jokaista jäsennettävää tiedostoa varten luodaan oma ParserContext. Jäsennysfunktiot käyttävät
+# nykyisen säikeen aktiivista kontekstia, jonka parseDeclaration asettaa, joten useita tiedostoja
+# voidaan jäsentää yhtä aikaa eri säikeissä.
+
+ACTIVE = threading.local()
+
+class ParserContext:
+	def __init__(self):
+		self.options = {
+			"kohdekoodi": False,
+			"takaisinviittaukset": False
+		}
+		self.current_class = None
+		self.allow_backreferences = False
+		# pino jokainen-lausekkeiden tallentamista varten (siis for-silmukoiden, vrt. rödan _)
+		self.for_stack = []
+		# ennakointifunktioiden tulokset, ks. memoizeLookahead
+		self.lookahead_memo = {}
+		self.lookahead_stats = {}
+		self.prev_contexts = []
+	def __enter__(self):
+		self.prev_contexts.append(getattr(ACTIVE, "parser", None))
+		ACTIVE.parser = self
+		return self
+	def __exit__(self, *args):
+		ACTIVE.parser = self.prev_contexts.pop()
+
+def parserContext():
+	return ACTIVE.parser
+
+# Ennakointifunktiot (esim. nextStartsNominalPhrase) eivät siirrä jäsentimen paikkaa, vaan niiden tulos riippuu
+# vain seuraavan merkitsevän tokenin paikasta ja argumenteista, joten tulokset voidaan tallentaa ParserContextiin.
+# lookahead_stats sisältää jokaiselle funktiolle muistista saatujen ja laskettujen tulosten määrän.
+# Nykyinen kielioppi kysyy harvoin samaa kohtaa kahdesti (ks. benchmarks/lookahead.py), joten muisti on
+# oletuksena pois päältä.
+
+MEMOIZE_LOOKAHEAD = False
+
+def memoizeLookahead(function):
+	name = function.__name__
+	def memoized(*args, **kwargs):
+		if not MEMOIZE_LOOKAHEAD:
+			return function(*args, **kwargs)
+		tokens = args[-1] if args and isinstance(args[-1], TokenList) else args[0]
+		context = parserContext()
+		key = (name, tokens.rank[tokens.i+1], args, tuple(sorted(kwargs.items())))
+		stats = context.lookahead_stats.setdefault(name, [0, 0])
+		if key in context.lookahead_memo:
+			stats[0] += 1
+			return context.lookahead_memo[key]
+		stats[1] += 1
+		ans = context.lookahead_memo[key] = function(*args, **kwargs)
+		return ans
+	memoized.__name__ = name
+	return memoized
 
 POSTPOSITIONS = {
 	"nimento": ["kertaa"],
@@ -123,187 +174,221 @@ def formToEnglish(form, article=True, short = False):
 		else: # intransitive participle
 			return "an agent to the " + form + " participle"
 
-def parseDeclaration(tokens):
-	global current_class
-	current_class = None
+def parseDeclaration(tokens, context):
+	with context:
+		context.current_class = None
+		return parseDeclarationWithContext(tokens, context)
+
+def parseDeclarationWithContext(tokens, context):
 	checkEof(tokens)
 	token = tokens.peek()
-	# Metodi, proseduuri
-	if token.token.lower() == "kun":
+	keyword = token.token.lower()
+	if keyword in DECLARATION_KEYWORDS:
+		decl = DECLARATION_KEYWORDS[keyword](tokens, context)
+		if decl:
+			return decl
+	# Vertailuoperaattori
+	elif afterCommaThereIs("jos", tokens):
+		return parseComparisonOperatorDecl(tokens)
+	# Muut
+	else:
+		decl = parseClassOrFunctionDecl(token, tokens, context)
+		if decl:
+			return decl
+	tokens.next()
+	syntaxError("malformed declaration", tokens)
+
+# Metodi, proseduuri
+def parseProcedureDecl(tokens, context):
+	tokens.next()
+	tokens.setStyle("keyword")
+	signature = parseSentence(tokens, signature=True)
+	if isinstance(signature, MethodCallStatement):
+		context.current_class = signature.obj.type
+	with AllowBackreferences():
+		body = parseList(parseSentence, tokens, do_format=True)
+	stmts = parseAdditionalStatements(tokens)
+	eatPeriod(tokens)
+	tokens.addNewline()
+	return ProcedureDecl(signature, body, stmts)
+
+# Globaali muuttuja
+def parseVariableDecl(tokens, context):
+	tokens.next()
+	tokens.setStyle("keyword")
+	word1, word2 = parseVariable(tokens, case="nimento")
+	value = parseNominativePredicative(tokens)
+	stmts = parseAdditionalStatements(tokens)
+	eatPeriod(tokens)
+	tokens.addNewline()
+	return VariableDecl(word1.baseform + "_" + word2.baseform, word2.baseform, value, stmts)
+
+# Imperatiivit
+def parseIncludeDecl(tokens, context):
+	tokens.next()
+	tokens.setStyle("keyword")
+	if context.options["kohdekoodi"] and tokens.peek() and tokens.peek().token.lower() == "kohdekoodi":
 		tokens.next()
 		tokens.setStyle("keyword")
-		signature = parseSentence(tokens, signature=True)
-		if isinstance(signature, MethodCallStatement):
-			current_class = signature.obj.type
-		with AllowBackreferences():
-			body = parseList(parseSentence, tokens, do_format=True)
+		code = tokens.next()
+		if not code.isString():
+			syntaxError("target code is not a string token", tokens)
+		tokens.setStyle("literal")
 		stmts = parseAdditionalStatements(tokens)
 		eatPeriod(tokens)
 		tokens.addNewline()
-		return ProcedureDecl(signature, body, stmts)
-	# Globaali muuttuja
-	elif token.token.lower() == "olkoon":
-		tokens.next()
+		return TargetCodeDecl(parseString(code.token), stmts)
+	elif tokens.peek() and tokens.peek().token.lower() in ["tiedosto"]+(["kohdekooditiedosto"] if context.options["kohdekoodi"] else []):
+		tc = tokens.next().token.lower() == "kohdekooditiedosto"
 		tokens.setStyle("keyword")
-		word1, word2 = parseVariable(tokens, case="nimento")
-		value = parseNominativePredicative(tokens)
+		filename = tokens.next()
+		if not filename.isString():
+			syntaxError("file name is not a string token", tokens)
+		tokens.setStyle("literal")
 		stmts = parseAdditionalStatements(tokens)
 		eatPeriod(tokens)
 		tokens.addNewline()
-		return VariableDecl(word1.baseform + "_" + word2.baseform, word2.baseform, value, stmts)
-	# Imperatiivit
-	elif token.token.lower() == "sisällytä":
+		if not tc:
+			return IncludeFileDecl(parseString(filename.token), stmts)
+		else:
+			return IncludeTargetCodeFileDecl(parseString(filename.token), stmts)
+
+def parseOptionDecl(tokens, context):
+	positive = tokens.next().token.lower() == "salli"
+	tokens.setStyle("keyword")
+	if tokens.peek() and tokens.peek().isWord():
+		option = tokens.next().token.lower()
+		tokens.setStyle("literal")
+		context.options[option] = positive
+		eatPeriod(tokens)
+		tokens.addNewline()
+		return SetOptionDecl(positive, option)
+
+def parseInterpretDecl(tokens, context):
+	tokens.next()
+	tokens.setStyle("keyword")
+	cl = tokens.next().toWord(cls=NOUN,forms="nimento")
+	if cl.form != "nimento":
+		syntaxError("class name not in the nominative case", tokens)
+	tokens.setStyle("type")
+	if (context.options["kohdekoodi"]
+		and tokens.peek() and tokens.peek().token.lower() == "kohdekoodityyppinä"
+		and tokens.peek(2) and tokens.peek(2).isString()):
 		tokens.next()
 		tokens.setStyle("keyword")
-		if options["kohdekoodi"] and tokens.peek() and tokens.peek().token.lower() == "kohdekoodi":
-			tokens.next()
-			tokens.setStyle("keyword")
-			code = tokens.next()
-			if not code.isString():
-				syntaxError("target code is not a string token", tokens)
-			tokens.setStyle("literal")
-			stmts = parseAdditionalStatements(tokens)
-			eatPeriod(tokens)
-			tokens.addNewline()
-			return TargetCodeDecl(parseString(code.token), stmts)
-		elif tokens.peek() and tokens.peek().token.lower() in ["tiedosto"]+(["kohdekooditiedosto"] if options["kohdekoodi"] else []):
-			tc = tokens.next().token.lower() == "kohdekooditiedosto"
-			tokens.setStyle("keyword")
-			filename = tokens.next()
-			if not filename.isString():
-				syntaxError("file name is not a string token", tokens)
-			tokens.setStyle("literal")
-			stmts = parseAdditionalStatements(tokens)
-			eatPeriod(tokens)
-			tokens.addNewline()
-			if not tc:
-				return IncludeFileDecl(parseString(filename.token), stmts)
-			else:
-				return IncludeTargetCodeFileDecl(parseString(filename.token), stmts)
-	elif token.token.lower() in ["salli", "kiellä"]:
-		positive = tokens.next().token.lower() == "salli"
-		tokens.setStyle("keyword")
-		if tokens.peek() and tokens.peek().isWord():
-			option = tokens.next().token.lower()
-			tokens.setStyle("literal")
-			options[option] = positive
-			eatPeriod(tokens)
-			tokens.addNewline()
-			return SetOptionDecl(positive, option)
-	elif token.token.lower() == "tulkitse":
+		tc_class = parseString(tokens.next().token)
+		tokens.setStyle("literal")
+		stmts = parseAdditionalStatements(tokens)
+		eatPeriod(tokens)
+		tokens.addNewline()
+		return TargetCodeClassDecl(cl.baseform, tc_class, stmts)
+	else:
+		cl2 = tokens.next().toWord(cls=NOUN,forms="olento")
+		if cl2.form != "olento":
+			syntaxError("class name not in the essive case", tokens)
+		tokens.setStyle("type")
+		stmts = parseAdditionalStatements(tokens)
+		eatPeriod(tokens)
+		tokens.addNewline()
+		return AliasClassDecl(cl.baseform, cl2.baseform, stmts)
+
+# määrittelyn ensimmäisen sanan perusteella valittava jäsennysfunktio
+# jos funktio palauttaa None, määrittely on virheellinen
+DECLARATION_KEYWORDS = {
+	"kun": parseProcedureDecl,
+	"olkoon": parseVariableDecl,
+	"sisällytä": parseIncludeDecl,
+	"salli": parseOptionDecl,
+	"kiellä": parseOptionDecl,
+	"tulkitse": parseInterpretDecl
+}
+
+# Vertailuoperaattori
+def parseComparisonOperatorDecl(tokens):
+	varname, typename, case = parseSelfVariable(tokens)
+	signature = parseConditionPredicateAndArgs(tokens, VariableExpr(varname, typename), case, allow_negation=False)
+	accept([","], tokens)
+	accept(["jos"], tokens)
+	tokens.setStyle("keyword")
+	conditions = parseOuterCondition(tokens, do_format=True)
+	wheres = parseWheres(tokens)
+	stmts = parseAdditionalStatements(tokens)
+	eatPeriod(tokens)
+	tokens.addNewline()
+	return CondFunctionDecl(typename, signature, conditions, wheres, stmts)
+
+# Luokka tai funktio
+def parseClassOrFunctionDecl(token, tokens, context):
+	word = token.toWord(cls=NOUN+ADJ,forms=["ulkoolento", "omanto", "nimento"])
+	# Luokka
+	if word.isNoun() and word.form == "ulkoolento":
 		tokens.next()
-		tokens.setStyle("keyword")
-		cl = tokens.next().toWord(cls=NOUN,forms="nimento")
-		if cl.form != "nimento":
-			syntaxError("class name not in the nominative case", tokens)
 		tokens.setStyle("type")
-		if (options["kohdekoodi"]
-			and tokens.peek() and tokens.peek().token.lower() == "kohdekoodityyppinä"
-			and tokens.peek(2) and tokens.peek(2).isString()):
-			tokens.next()
-			tokens.setStyle("keyword")
-			tc_class = parseString(tokens.next().token)
-			tokens.setStyle("literal")
-			stmts = parseAdditionalStatements(tokens)
-			eatPeriod(tokens)
-			tokens.addNewline()
-			return TargetCodeClassDecl(cl.baseform, tc_class, stmts)
-		else:
-			cl2 = tokens.next().toWord(cls=NOUN,forms="olento")
-			if cl2.form != "olento":
-				syntaxError("class name not in the essive case", tokens)
-			tokens.setStyle("type")
-			stmts = parseAdditionalStatements(tokens)
-			eatPeriod(tokens)
-			tokens.addNewline()
-			return AliasClassDecl(cl.baseform, cl2.baseform, stmts)
-	# Vertailuoperaattori
-	elif afterCommaThereIs("jos", tokens):
-		varname, typename, case = parseSelfVariable(tokens)
-		signature = parseConditionPredicateAndArgs(tokens, VariableExpr(varname, typename), case, allow_negation=False)
-		accept([","], tokens)
-		accept(["jos"], tokens)
+		kw = accept(["on", "ei"], tokens)
 		tokens.setStyle("keyword")
-		conditions = parseOuterCondition(tokens, do_format=True)
-		wheres = parseWheres(tokens)
+		if kw == "on":
+			fields = parseList(parseFieldDecl, tokens)
+		else:
+			accept(["ole"], tokens)
+			tokens.setStyle("keyword")
+			accept(["kenttiä"], tokens)
+			tokens.setStyle("keyword")
+			fields = []
 		stmts = parseAdditionalStatements(tokens)
 		eatPeriod(tokens)
 		tokens.addNewline()
-		return CondFunctionDecl(typename, signature, conditions, wheres, stmts)
-	# Muut
-	else:
-		word = token.toWord(cls=NOUN+ADJ,forms=["ulkoolento", "omanto", "nimento"])
-		# Luokka
-		if word.isNoun() and word.form == "ulkoolento":
+		return ClassDecl(word.baseform, fields, stmts)
+	elif word.isNoun() or word.isAdjective():
+		varname, typename, case = parseSelfVariable(tokens, ["omanto", "nimento"])
+		context.current_class = typename
+		# Perivä luokka
+		if varname == "" and case == "nimento" and tokens.peek() and tokens.peek().token.lower() == "on":
 			tokens.next()
-			tokens.setStyle("type")
-			kw = accept(["on", "ei"], tokens)
 			tokens.setStyle("keyword")
-			if kw == "on":
-				fields = parseList(parseFieldDecl, tokens)
-			else:
-				accept(["ole"], tokens)
+			if word.form != "nimento":
+				syntaxError("class name not in the nominative case", tokens)
+			checkEof(tokens)
+			super_type = tokens.next().toWord(cls=NOUN,forms=["nimento"])
+			if not super_type.isNoun() or super_type.form != "nimento":
+				syntaxError("super type must be a noun in the nominative case", tokens)
+			if tokens.peek() and tokens.peek().token == ",":
+				tokens.next()
+				accept(["jolla"], tokens)
 				tokens.setStyle("keyword")
-				accept(["kenttiä"], tokens)
+				accept(["on"], tokens)
 				tokens.setStyle("keyword")
+				fields = parseList(parseFieldDecl, tokens)
+			else:
 				fields = []
 			stmts = parseAdditionalStatements(tokens)
 			eatPeriod(tokens)
 			tokens.addNewline()
-			return ClassDecl(word.baseform, fields, stmts)
-		elif word.isNoun() or word.isAdjective():
-			varname, typename, case = parseSelfVariable(tokens, ["omanto", "nimento"])
-			current_class = typename
-			# Perivä luokka
-			if varname == "" and case == "nimento" and tokens.peek() and tokens.peek().token.lower() == "on":
+			return ClassDecl(typename, fields, stmts, super_type=super_type.baseform)
+		# Funktio
+		elif case in ["omanto", "nimento"]:
+			place = tokens.place()
+			field, field_case, field_number, param, param_case = parseFieldName(tokens, word.form)
+			if field in ARI_OPERATORS and ARI_OPERATORS[field][0] == param_case:
+				tokens.setPlace(place)
+				tokens.next()
+				syntaxError("redefinition of builtin", tokens)
+			if (field_case == "nimento" and field_number == "plural") or (field_case == "olento" and word.number == "plural"):
+				accept(["ovat"], tokens)
+			else:
+				accept(["on"], tokens)
+			tokens.setStyle("keyword")
+			if tokens.peek().token.lower() == "pysyvästi":
 				tokens.next()
 				tokens.setStyle("keyword")
-				if word.form != "nimento":
-					syntaxError("class name not in the nominative case", tokens)
-				checkEof(tokens)
-				super_type = tokens.next().toWord(cls=NOUN,forms=["nimento"])
-				if not super_type.isNoun() or super_type.form != "nimento":
-					syntaxError("super type must be a noun in the nominative case", tokens)
-				if tokens.peek() and tokens.peek().token == ",":
-					tokens.next()
-					accept(["jolla"], tokens)
-					tokens.setStyle("keyword")
-					accept(["on"], tokens)
-					tokens.setStyle("keyword")
-					fields = parseList(parseFieldDecl, tokens)
-				else:
-					fields = []
-				stmts = parseAdditionalStatements(tokens)
-				eatPeriod(tokens)
-				tokens.addNewline()
-				return ClassDecl(typename, fields, stmts, super_type=super_type.baseform)
-			# Funktio
-			elif case in ["omanto", "nimento"]:
-				place = tokens.place()
-				field, field_case, field_number, param, param_case = parseFieldName(tokens, word.form)
-				if field in ARI_OPERATORS and ARI_OPERATORS[field][0] == param_case:
-					tokens.setPlace(place)
-					tokens.next()
-					syntaxError("redefinition of builtin", tokens)
-				if (field_case == "nimento" and field_number == "plural") or (field_case == "olento" and word.number == "plural"):
-					accept(["ovat"], tokens)
-				else:
-					accept(["on"], tokens)
-				tokens.setStyle("keyword")
-				if tokens.peek().token.lower() == "pysyvästi":
-					tokens.next()
-					tokens.setStyle("keyword")
-					memoize = True
-				else:
-					memoize = False
-				body = parseNominativePredicative(tokens)
-				wheres = parseWheres(tokens)
-				stmts = parseAdditionalStatements(tokens)
-				eatPeriod(tokens)
-				tokens.addNewline()
-				return FunctionDecl(typename, field, varname, param, param_case, body, wheres, memoize, stmts)
-	tokens.next()
-	syntaxError("malformed declaration", tokens)
+				memoize = True
+			else:
+				memoize = False
+			body = parseNominativePredicative(tokens)
+			wheres = parseWheres(tokens)
+			stmts = parseAdditionalStatements(tokens)
+			eatPeriod(tokens)
+			tokens.addNewline()
+			return FunctionDecl(typename, field, varname, param, param_case, body, wheres, memoize, stmts)
 
 def parseSelfVariable(tokens, forms=[]):
 	word = tokens.next().toWord(cls=ADJ+NOUN,forms=forms)
@@ -439,38 +524,33 @@ def parseAdditionalStatements(tokens):
 
 class AllowBackreferences:
 	def __enter__(self):
-		global allow_backreferences
-		self.prev = allow_backreferences
-		allow_backreferences = options["takaisinviittaukset"]
+		self.context = parserContext()
+		self.prev = self.context.allow_backreferences
+		self.context.allow_backreferences = self.context.options["takaisinviittaukset"]
 	def __exit__(self, *args):
-		global allow_backreferences
-		allow_backreferences = self.prev
-
-allow_backreferences = False
-
-# pino jokainen-lausekkeiden tallentamista varten (siis for-silmukoiden, vrt. rödan _)
-FOR_STACK = []
+		self.context.allow_backreferences = self.prev
 
 ForVar = namedtuple("ForVar", ["name", "expr", "type"])
 
 def pushFor(*allowed_types):
-	FOR_STACK.append((allowed_types, []))
+	parserContext().for_stack.append((allowed_types, []))
 
 def addForVar(i_name, expr, var_type, tokens):
 	if var_type == "mikään":
 		var_type = "jokainen"
-	if len(FOR_STACK) == 0 or var_type not in FOR_STACK[-1][0]:
+	for_stack = parserContext().for_stack
+	if len(for_stack) == 0 or var_type not in for_stack[-1][0]:
 		syntaxError("\"" + var_type + "\" can't be used in this context", tokens)
 	name = i_name
 	i = 1
-	while [fv.name for fv in FOR_STACK[-1][1]].count(name) > 0:
+	while [fv.name for fv in for_stack[-1][1]].count(name) > 0:
 		name = i_name + str(i)
 		i += 1
-	FOR_STACK[-1][1].append(ForVar(name, expr, var_type))
+	for_stack[-1][1].append(ForVar(name, expr, var_type))
 	return name
 
 def popFor():
-	return FOR_STACK.pop()[1]
+	return parserContext().for_stack.pop()[1]
 
 def parseSentence(tokens, signature=False):
 	checkEof(tokens)
@@ -636,6 +716,7 @@ def parsePredicate(word, tokens, subject_case):
 	
 	return predicate, passive
 
+@memoizeLookahead
 def nextIsValidVerbModifier(tokens, allow_adverbs=True, allow_verbs=True, disallow_nominative_noun=False):
 	token = tokens.peek()
 	if not token or not token.isWord():
@@ -862,6 +943,7 @@ def parseOperator(tokens):
 
 NOMINAL_PHRASE_CLASS = 2*ADJ+2*NUMERAL+2*CONJ+2*PRONOUN+NOUN
 
+@memoizeLookahead
 def nextStartsNominalPhrase(tokens):
 	if tokens.eof():
 		return False
@@ -871,6 +953,7 @@ def nextStartsNominalPhrase(tokens):
 	word = peek.toWord(cls=NOMINAL_PHRASE_CLASS)
 	return canStartNominalPhrase(word, tokens)
 
+@memoizeLookahead
 def canStartNominalPhrase(word, tokens):
 	return ((word.isAdjective()
 			and tokens.peek(2) and tokens.peek(2).isWord()
@@ -978,7 +1061,7 @@ def parseNominalPhrase(tokens, must_be_in_genitive=False, promoted_cases=[], pre
 			eatComma(tokens)
 			case = word.form
 			expr = LambdaExpr(body)
-		elif (allow_backreferences and
+		elif (parserContext().allow_backreferences and
 			nextIsValidVerbModifier(tokens, allow_adverbs=False, allow_verbs=False)
 			and tokens.peek().toWord(cls=NOUN,forms=word.form).agreesWith(word)): # takaisinviittaus edelliseen lausekkeeseen esim. "se olio"
 			tokens.setStyle("variable")
@@ -999,7 +1082,7 @@ def parseNominalPhrase(tokens, must_be_in_genitive=False, promoted_cases=[], pre
 					tokens.next()
 					tokens.setStyle("variable", continued=True)
 			case = word.form
-			expr = VariableExpr("this", vtype=current_class)
+			expr = VariableExpr("this", vtype=parserContext().current_class)
 	elif word.baseform == "siellä":
 		tokens.setStyle("variable")
 		if word.word.lower() == "siellä":
@@ -1022,7 +1105,7 @@ def parseNominalPhrase(tokens, must_be_in_genitive=False, promoted_cases=[], pre
 				if word2.baseform == "itse" and word2.agreesWith(word):
 					tokens.next()
 					tokens.setStyle("variable", continued=True)
-			expr = VariableExpr("this", vtype=current_class)
+			expr = VariableExpr("this", vtype=parserContext().current_class)
 	elif ((word.isAdjective() and word.baseform == "uusi")
 		or (word.isAdjective() and tokens.peek() and tokens.peek().toWord(cls=NOUN,forms=[word.form]).agreesWith(word, baseform="uusi"))
 		or (word.isNoun() and tokens.peek(1) and tokens.peek(1).token == "," and tokens.peek(2).token.lower() == "jonka")
@@ -14,32 +14,155 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
+import threading
 from fatal_error import typeError
 
-classes = {}
+# luokkahierarkia
+#
+# Jokaisella kääntäjän kontekstilla on oma hierarkiansa. Alla olevat funktiot käyttävät nykyisen
+# säikeen aktiivista hierarkiaa, jonka CompilerFrame asettaa.
+#
+# Hierarkia numeroi luokkansa luontijärjestyksessä, ja tyyppipäättelyn luokkajoukot (ClassSet) ovat
+# kokonaislukuja, joissa on bitti jokaiselle joukkoon kuuluvalle luokalle. Jokaisella luokalla on
+# valmiiksi laskettu maski, joka sisältää luokan ja sen aliluokat, joten joukkojen yhdisteet ja
+# leikkaukset ovat yksittäisiä kokonaislukuoperaatioita.
+#
+# Jäsenhaut (memberIndex) ja tyyppinimien luokat (classesOfTypeName) lasketaan kerran ja
+# tallennetaan hierarkiaan. Välimuistit tyhjennetään, kun hierarkiaan lisätään luokka tai jäsen.
+
+ACTIVE = threading.local()
+
+class Hierarchy:
+	def __init__(self):
+		self.classes = {}
+		# numero -> luokka, aliakset ja uudelleenmääritellyt luokat säilyttävät numeronsa
+		self.numbered = []
+		self.all_classes = None
+		self.functions = {}
+		self.fields = {}
+		# (jäsenen nimi, argumentin sija) -> Member
+		self.members = {}
+		# tyypin nimi -> ClassSet
+		self.type_names = {}
+		self.prev_hierarchies = []
+	def invalidate(self):
+		self.all_classes = None
+		self.members = {}
+		self.type_names = {}
+	def __enter__(self):
+		self.prev_hierarchies.append(getattr(ACTIVE, "hierarchy", None))
+		ACTIVE.hierarchy = self
+		return self
+	def __exit__(self, *args):
+		ACTIVE.hierarchy = self.prev_hierarchies.pop()
+
+def currentHierarchy():
+	return ACTIVE.hierarchy
+
+def addClass(name, cl):
+	hierarchy = currentHierarchy()
+	hierarchy.classes[name] = cl
+	hierarchy.invalidate()
 
 def getClass(name):
+	classes = currentHierarchy().classes
 	if name in classes:
 		return classes[name]
 	else:
 		typeError("class not found: " + name)
 
 def isClass(name):
-	return name in classes
+	return name in currentHierarchy().classes
 
 def classSet():
-	return set(classes.values())
+	hierarchy = currentHierarchy()
+	if hierarchy.all_classes is None:
+		mask = 0
+		for cl in hierarchy.classes.values():
+			mask |= cl.bit
+		hierarchy.all_classes = ClassSet(mask, hierarchy.numbered)
+	return hierarchy.all_classes
 
-functions = {}
-fields = {}
+def classesOfTypeName(type_name):
+	# yhdyssanan loppuosat, jotka ovat luokkien nimiä, esim. "pikkuluku" -> {luku}
+	hierarchy = currentHierarchy()
+	if type_name not in hierarchy.type_names:
+		names = [type_name[i:] for i in range(len(type_name)) if type_name[i:] in hierarchy.classes]
+		hierarchy.type_names[type_name] = classesByName(*names)
+	return hierarchy.type_names[type_name]
+
+def memberIndex(name, arg_form):
+	hierarchy = currentHierarchy()
+	key = (name, arg_form)
+	if key not in hierarchy.members:
+		functions = hierarchy.functions.get(name+"_"+str(arg_form), [])
+		fields = hierarchy.fields.get(name, []) if not arg_form else []
+		hierarchy.members[key] = Member(functions, fields)
+	return hierarchy.members[key]
+
+class Member:
+	# kaikki samannimiset funktiot (tai kentät) ja niiden luokkien maskit
+	def __init__(self, functions, fields):
+		self.functions = functions
+		self.fields = fields
+		self.function_classes = 0
+		for f in functions:
+			self.function_classes |= f.cl.closure
+		self.field_classes = 0
+		for f in fields:
+			self.field_classes |= f.cl.closure
+		# olion tyyppien maski -> paluutyyppien joukko, kun funktioiden tyypit on ratkaistu
+		self.return_types = {}
+	def isEmpty(self):
+		return not self.functions and not self.fields
+
+def classesByName(*names):
+	hierarchy = currentHierarchy()
+	mask = 0
+	for name in names:
+		mask |= getClass(name).bit
+	return ClassSet(mask, hierarchy.numbered)
+
+class ClassSet:
+	# muuttumaton luokkajoukko, jonka jäsenet ovat maskin bitit (ks. Class.bit)
+	__slots__ = ("mask", "numbered")
+	def __init__(self, mask=0, numbered=None):
+		self.mask = mask
+		self.numbered = numbered
+	def __or__(self, other):
+		return ClassSet(self.mask | other.mask, self.numbered or other.numbered)
+	def __and__(self, other):
+		return ClassSet(self.mask & other.mask, self.numbered or other.numbered)
+	def isdisjoint(self, other):
+		return not self.mask & other.mask
+	def __contains__(self, cl):
+		return bool(self.mask & cl.bit)
+	def __bool__(self):
+		return self.mask != 0
+	def __len__(self):
+		return bin(self.mask).count("1")
+	def __iter__(self):
+		mask = self.mask
+		while mask:
+			low = mask & -mask
+			yield self.numbered[low.bit_length()-1]
+			mask ^= low
+	def __eq__(self, other):
+		return isinstance(other, ClassSet) and self.mask == other.mask
+	def __hash__(self):
+		return hash(self.mask)
+	def __repr__(self):
+		return "{" + ", ".join(cl.name for cl in self) + "}"
 
 def getFunctions(name):
+	functions = currentHierarchy().functions
 	if name in functions:
 		return functions[name]
 	else:
 		return []
 
 def getFields(name):
+	fields = currentHierarchy().fields
 	if name in fields:
 		return fields[name]
 	else:
@@ -49,30 +172,39 @@ class Class:
 	def __init__(self, name, super_class):
 		self.name = name
 		self.super_class = super_class and getClass(super_class)
-		if self.super_class:
-			self.super_class.addSubclass(self)
-		self.subclasses = set()
+		self.numbered = currentHierarchy().numbered
+		self.bit = 1 << len(self.numbered)
+		self.numbered.append(self)
+		currentHierarchy().invalidate()
+		# luokka ja sen kaikki aliluokat
+		self.closure = self.bit
+		cl = self.super_class
+		while cl:
+			cl.closure |= self.bit
+			cl = cl.super_class
 		self.fields = []
 		self.functions = []
 		self.methods = []
 		self.comparison_operators = []
 	def __repr__(self):
 		return "<Class " + self.name + ">"
-	def addSubclass(self, cl):
-		self.subclasses.add(cl)
-		if self.super_class:
-			self.super_class.addSubclass(cl)
+	def classes(self):
+		return ClassSet(self.closure, self.numbered)
 	def addField(self, name, plural):
 		f = Field(name, plural, self)
 		self.fields.append(f)
+		fields = currentHierarchy().fields
 		if name not in fields:
 			fields[name] = []
 		fields[name].append(f)
-	def addFunction(self, name, arg_form, expr):
-		f = Function(name, arg_form, expr, self)
+		currentHierarchy().invalidate()
+	def addFunction(self, name, arg_form, expr, options):
+		f = Function(name, arg_form, expr, self, options)
+		functions = currentHierarchy().functions
 		if name+"_"+str(arg_form) not in functions:
 			functions[name+"_"+str(arg_form)] = []
 		functions[name+"_"+str(arg_form)].append(f)
+		currentHierarchy().invalidate()
 		self.functions.append(f)
 	def addMethod(self, name, arg_forms):
 		self.methods.append(Method(name, arg_forms))
@@ -89,22 +221,18 @@ class Field:
 		self.plural = plural
 		self.cl = cl
 	def classes(self):
-		return set([self.cl]) | self.cl.subclasses
+		return self.cl.classes()
 
 class Function:
-	def __init__(self, name, arg_form, expr, cl):
+	def __init__(self, name, arg_form, expr, cl, options):
 		self.name = name
 		self.arg_form = arg_form
 		self.expr = expr
 		self.cl = cl
-		self.type = None
-	def inferType(self):
-		if self.type is None:
-			self.type = set() # rekursion vuoksi tyypin on oltava inferenssin aikana tyhjä
-			self.type = self.expr.inferType()
-		return self.type
+		# kääntäjän asetukset määrittelyn kohdalla, esim. onko kohdekoodi sallittu
+		self.options = options
 	def classes(self):
-		return set([self.cl]) | self.cl.subclasses
+		return self.cl.classes()
 
 class Method:
 	def __init__(self, name, arg_forms):
@@ -0,0 +1,178 @@
+# Tampio Compiler
+# Copyright (C) 2018 Iikka Hauhio
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import bisect
+from lex import TokenList, Punctuation, LOOKAHEAD, splitCode, makeTokens
+from grammar import ParserContext
+from ast import CompilerContext, VariableExpr, FieldExpr
+from parallel import declarationSpans, parseSpan, mergeSpans
+
+# Inkrementaalinen jäsentäminen
+#
+# Editori kääntää koodin uudelleen jokaisen muutoksen jälkeen. IncrementalParser muistaa edellisen
+# version tokenit ja jokaisen määrittelyn jäsennystuloksen (ks. parallel.py) ja käsittelee uudelleen
+# vain muuttuneen kohdan.
+#
+# Tokenit luodaan uudelleen muutosta edeltävästä pisteestä alkaen, kunnes uusi tokenisointi
+# kohtaa vanhan muuttumattomassa loppuosassa. Tokenisointi voidaan aloittaa välimerkin jälkeen
+# alusta, paitsi jos sitä ennen on sana, jossa on merkkijonon, kommentin tai sulkukommentin
+# aloittava merkki: muutos voi sulkea sen, jolloin aiemmatkin tokenit muuttuvat.
+#
+# Määrittelyn tulosta käytetään uudelleen, jos sen tokenit ja niitä seuraavat LOOKAHEAD merkitsevää
+# tokenia ovat muuttumattomassa alku- tai loppuosassa. Loppuosan syntaksipuissa olevia tokenien
+# indeksejä siirretään tokenien määrän muutoksen verran.
+
+OPENERS = "\"#("
+
+def commonAffixes(a, b):
+	# pisimmät yhteiset alku- ja loppuosat etsitään puolitushaulla, koska merkkijonojen vertailu on nopeaa
+	n = min(len(a), len(b))
+	lo, hi = 0, n
+	while lo < hi:
+		mid = (lo+hi+1)//2
+		if a[:mid] == b[:mid]:
+			lo = mid
+		else:
+			hi = mid-1
+	prefix = lo
+	lo, hi = 0, n-prefix
+	while lo < hi:
+		mid = (lo+hi+1)//2
+		if a[len(a)-mid:] == b[len(b)-mid:]:
+			lo = mid
+		else:
+			hi = mid-1
+	return prefix, lo
+
+def shiftPlaces(objs, delta):
+	seen = set()
+	stack = list(objs)
+	while stack:
+		obj = stack.pop()
+		if id(obj) in seen:
+			continue
+		seen.add(id(obj))
+		if isinstance(obj, (list, tuple)):
+			stack += obj
+		elif isinstance(obj, dict):
+			stack += obj.values()
+		elif type(obj).__module__ == "ast" and hasattr(obj, "__dict__") and not isinstance(obj, CompilerContext):
+			if isinstance(obj, (VariableExpr, FieldExpr)) and obj.place is not None:
+				obj.place += delta
+			stack += obj.__dict__.values()
+
+def shiftResult(result, delta):
+	if delta == 0:
+		return result
+	decl, error, place, options, indent_delta, for_frames, base_used, styles, style_spans, newlines, indent_levels = result
+	shiftPlaces([decl, for_frames], delta)
+	if error:
+		error = (error[0], error[1] + delta)
+	return (decl, error, place + delta, options, indent_delta, for_frames, base_used, styles, style_spans, newlines, indent_levels)
+
+class IncrementalParser:
+	def __init__(self, threads=1):
+		self.threads = threads
+		self.code = ""
+		self.tokens = TokenList([])
+		# niiden sanojen indeksit, joissa on OPENERS-merkkejä
+		self.openers = []
+		# välin alun indeksi -> (asetukset, viimeinen tokeni, josta tulos riippuu, parseSpan-funktion tulos)
+		self.results = {}
+		self.decls = []
+		self.errors = []
+	def edit(self, start, end, text, report_error=None):
+		return self.update(self.code[:start] + text + self.code[end:], report_error)
+	def update(self, code, report_error=None):
+		# palauttaa tokenlistan, määrittelyt ja listan määrittelyistä, joita ei käytetty uudelleen
+		old_tokens = self.tokens.tokens
+		old_offsets = self.tokens.offsets
+		# shiftResult muuttaa syntaksipuita, joten välimuisti tyhjennetään siltä varalta, että jäsentäminen kaatuu
+		old_results, self.results = self.results, {}
+		prefix, suffix = commonAffixes(self.code, code)
+		a = self.restartPoint(prefix)
+		pos = old_offsets[a+1]
+		delta_chars = len(code) - len(self.code)
+		words = []
+		b = len(old_tokens)
+		for word in splitCode(code, pos):
+			words.append(word)
+			pos += len(word.token if isinstance(word, Punctuation) else word)
+			if isinstance(word, Punctuation) and pos >= len(code) - suffix:
+				j = bisect.bisect_left(old_offsets, pos - delta_chars)
+				if a < j <= len(old_tokens) and old_offsets[j] == pos - delta_chars and (j == 0 or isinstance(old_tokens[j-1], Punctuation)):
+					b = j
+					break
+		tokens = TokenList(old_tokens[:a+1] + makeTokens(words, self.threads) + old_tokens[b:])
+		shift = a+1 + len(words) - b
+		
+		spans = declarationSpans(tokens)
+		results = []
+		reused = set()
+		for start, end, options in spans:
+			if start <= a:
+				entry = old_results.get(start)
+				if entry and entry[1] > a:
+					entry = None
+			elif start >= b + shift:
+				entry = old_results.get(start - shift)
+			else:
+				entry = None
+			if entry and entry[0] == options:
+				result = shiftResult(entry[2], shift if start > a else 0)
+				reused.add(id(result[0]))
+			else:
+				result = parseSpan(tokens, start, end, options)
+			results.append(result)
+		
+		# parseSpan kirjoittaa tyylit suoraan tokenlistaan, joten tyhjennetään ne ennen yhdistämistä
+		n = len(tokens.tokens)
+		tokens.styles = [""]*n
+		tokens.style_spans = [(False, False)]*n
+		tokens.newlines = [False]*n
+		tokens.indent_levels = [0]*n
+		tokens.setPlace(-1)
+		tokens.indent_level = 0
+		errors = []
+		def reportError(e):
+			errors.append(e)
+			if report_error:
+				report_error(e)
+		decls = mergeSpans(tokens, ParserContext(), spans, results, reportError)
+		
+		for (start, _, options), result in zip(spans, results):
+			if result:
+				r = tokens.rank[result[2]+1] + LOOKAHEAD - 1
+				dependency_end = tokens.significant[r] if r < len(tokens.significant) else len(tokens.tokens)
+				self.results[start] = (options, dependency_end, result)
+		self.code = code
+		self.tokens = tokens
+		self.openers = ([k for k in self.openers if k <= a]
+			+ [a+1+k for k, word in enumerate(words) if isinstance(word, str) and any(c in word for c in OPENERS)]
+			+ [k + shift for k in self.openers if k >= b])
+		self.decls = decls
+		self.errors = errors
+		return tokens, decls, [decl for decl in decls if id(decl) not in reused]
+	def restartPoint(self, prefix):
+		# viimeinen piste, joka päättyy ennen muutosta ja jota ennen ei ole avaavia merkkejä sisältäviä sanoja
+		tokens = self.tokens
+		j = tokens.tokenAt(prefix) - 1
+		if self.openers:
+			j = min(j, self.openers[0]-1)
+		r = tokens.rank[j+1] if j >= 0 else 0
+		while r > 0 and tokens.tokens[tokens.significant[r-1]].token != ".":
+			r -= 1
+		return tokens.significant[r-1] if r > 0 else -1
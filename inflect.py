@@ -14,8 +14,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-import re
-from voikko.inflect_word import inflect_word
+import os, pickle, re
+from voikko.inflect_word import inflect_word, source_hash
 
 CASES_LATIN = {
 	"nimento": "nominatiivi",
@@ -175,45 +175,116 @@ ORDINAL_CASE_REGEXES = {
 	"kerrontosti": r"[^:]+:nnesti"
 }
 
+# kaksoispisteellä taivutetut literaalit (esim. x:n, 2:nnen) tunnistetaan yhdellä säännöllisellä lausekkeella
+# sijamuotojen lausekkeet ovat keskenään erilliset, ja ne kokeillaan ennen järjestyslukujen lausekkeita
+# (esim. x:ttä on vajanto eikä järjestysluvun osanto)
+
+def compileColonFormRegex():
+	forms = {}
+	alternatives = []
+	for number in CASE_REGEXES:
+		for case in CASE_REGEXES[number]:
+			name = "f" + str(len(forms))
+			forms[name] = (case, number, False)
+			alternatives.append("(?P<" + name + ">" + CASE_REGEXES[number][case] + ")")
+	for case in ORDINAL_CASE_REGEXES:
+		name = "f" + str(len(forms))
+		forms[name] = (case, "", True)
+		alternatives.append("(?P<" + name + ">" + ORDINAL_CASE_REGEXES[case] + ")")
+	return re.compile("|".join(alternatives)), forms
+
+COLON_FORM_REGEX, COLON_FORMS = compileColonFormRegex()
+
+def colonForm(word):
+	m = COLON_FORM_REGEX.fullmatch(word)
+	if m:
+		return COLON_FORMS[m.lastgroup]
+	return None
+
+# numeroiden ja yksittäisten kirjainten taivutusmuodot lasketaan valmiiksi taulukoihin
+
+def numberEnding(digit, case):
+	if case == "sisatulento":
+		if digit in "123560":
+			return ":een"
+		elif digit in "479":
+			return ":ään"
+		else: # 8
+			return ":aan"
+	elif digit in "14579":
+		return CASES_A[case].replace("a", "ä")
+	else:
+		return CASES_A[case]
+
+def letterForm(word, case):
+	if word in "flmnrsx":
+		return word + CASES_F[case]
+	elif case == "sisatulento":
+		if word in "aeiouyäöå":
+			return word + ":h" + word + "n"
+		elif word in "bcdgptvw":
+			return word + ":hen"
+		elif word in "hk":
+			return word + ":hon"
+		elif word == "j":
+			return "j:hin"
+		elif word == "q":
+			return "q:hun"
+		elif word == "z":
+			return "z:aan"
+	elif word in "ahkoquzå":
+		return word + CASES_A[case]
+	else:
+		return word + CASES_A[case].replace("a", "ä")
+
+NUMBER_ENDINGS = {digit: {case: numberEnding(digit, case) for case in CASES_A} for digit in "0123456789"}
+LETTER_FORMS = {letter: {case: letterForm(letter, case) for case in CASES_A} for letter in "abcdefghijklmnopqrstuvwxyzåäö"}
+
+# sanojen koko taivutusparadigmat tallennetaan välimuistiin, koska inflect_word luo aina kaikki muodot
+# välimuistin voi tallentaa tiedostoon ja ladata seuraavalla kerralla (saveParadigms ja loadParadigms)
+
+PARADIGMS = {}
+
+def paradigm(word):
+	if word not in PARADIGMS:
+		PARADIGMS[word] = inflect_word(word)
+	return PARADIGMS[word]
+
+def loadParadigms(filename):
+	try:
+		with open(filename, "rb") as f:
+			version, paradigms = pickle.load(f)
+	except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+		return False
+	if version != source_hash():
+		return False
+	for word in paradigms:
+		PARADIGMS.setdefault(word, paradigms[word])
+	return True
+
+def saveParadigms(filename, words=None):
+	for word in words or []:
+		paradigm(word)
+	tmp_file = filename + "." + str(os.getpid()) + ".tmp"
+	if os.path.dirname(filename):
+		os.makedirs(os.path.dirname(filename), exist_ok=True)
+	with open(tmp_file, "wb") as f:
+		pickle.dump((source_hash(), PARADIGMS), f, pickle.HIGHEST_PROTOCOL)
+	os.replace(tmp_file, filename)
+
 def inflect(word, case, plural):
 	case_latin = CASES_LATIN[case]
 	if plural:
 		case_latin += "_mon"
 	
-	if re.fullmatch(r"[0-9]+", word):
-		if case == "sisatulento":
-			if word[-1] in "123560":
-				return word + ":een"
-			elif word[-1] in "479":
-				return word + ":ään"
-			else: # 8
-				return word + ":aan"
-		elif word[-1] in "14579":
-			return word + CASES_A[case].replace("a", "ä")
-		else:
-			return word + CASES_A[case]
+	if word.isdigit() and word.isascii():
+		return word + NUMBER_ENDINGS[word[-1]][case]
 	elif len(word) == 1:
-		if word in "flmnrsx":
-			return word + CASES_F[case]
-		elif case == "sisatulento":
-			if word in "aeiouyäöå":
-				return word + ":h" + word + "n"
-			elif word in "bcdgptvw":
-				return word + ":hen"
-			elif word in "hk":
-				return word + ":hon"
-			elif word == "j":
-				return "j:hin"
-			elif word == "q":
-				return "q:hun"
-			elif word == "z":
-				return "z:aan"
-		elif word in "ahkoquzå":
-			return word + CASES_A[case]
-		else:
-			return word + CASES_A[case].replace("a", "ä")
+		if word in LETTER_FORMS:
+			return LETTER_FORMS[word][case]
+		return letterForm(word, case)
 	else:
-		inflections = inflect_word(word)
+		inflections = paradigm(word)
 		if case_latin not in inflections:
 			return word + ":" + case
 		return inflections[case_latin]
@@ -14,114 +14,215 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-import html, re
-from voikko.libvoikko import Voikko, Token
+import atexit, bisect, html, re, threading
+from functools import lru_cache
+from itertools import accumulate, islice
+from voikko.libvoikko import Token
 from fatal_error import syntaxError
 from inflect import *
+from morphology import AnalysisCache, defaultCacheFile
 
 LANGUAGE = "fi-x-morpho"
 ENCODING = "UTF-8"
 
-voikko = Voikko(LANGUAGE)
+voikko = AnalysisCache(LANGUAGE, defaultCacheFile())
+atexit.register(voikko.save)
 
-def lexCode(code):
+# jäsennin katsoo enintään näin monta merkitsevää tokenia eteenpäin (tokens.peek(3))
+LOOKAHEAD = 3
+
+STREAM_BATCH_SIZE = 1024
+
+SEPARATOR = re.compile(r'\s|\.|,|;|\[|\]|"[^"]*"|#[^\n]*\n|\([^()]*\)')
+
+def lexCode(code, threads=1):
+	return TokenList(makeTokens(list(splitCode(code)), threads))
+
+# jakaa koodin kohdasta pos alkaen sanoihin (merkkijonot) ja välimerkkeihin (Punctuation-oliot)
+def splitCode(code, pos=0):
+	for match in SEPARATOR.finditer(code, pos):
+		if match.start() > pos:
+			yield code[pos:match.start()]
+		yield Punctuation(match.group())
+		pos = match.end()
+	if pos < len(code):
+		yield code[pos:]
+
+# Tiedoston lukeminen paloittain
+#
+# Merkkijono, kommentti tai sulkukommentti voi jatkua seuraavaan palaan. Sanan keskellä oleva ", # tai (
+# tarkoittaa, että tällaista tokenia ei löytynyt, mutta se voi löytyä, kun seuraava pala luetaan, joten
+# tällaisen sanan kohdalta jatketaan vasta, kun lisää tekstiä on luettu. Muut tokenit eivät riipu
+# myöhemmästä tekstistä.
+
+CHUNK_SIZE = 1 << 16
+
+def lexFile(f, threads=1, chunk_size=CHUNK_SIZE):
+	return StreamingTokenList(splitFile(f, chunk_size), threads)
+
+def splitFile(f, chunk_size=CHUNK_SIZE):
+	buffer = ""
+	while True:
+		chunk = f.read(chunk_size)
+		buffer += chunk
+		pos = 0
+		for match in SEPARATOR.finditer(buffer):
+			word = buffer[pos:match.start()]
+			if chunk and any(c in word for c in "\"#("):
+				break
+			if word:
+				yield word
+			yield Punctuation(match.group())
+			pos = match.end()
+		buffer = buffer[pos:]
+		if not chunk:
+			if buffer:
+				yield buffer
+			return
+
+def makeTokens(words, threads=1):
+	# analysoidaan kaikki eri sanat kerralla ennen tokenien luomista
+	voikko.analyzeAll(set(word for word in words if isinstance(word, str) and not colonForm(word)), threads)
 	output = []
-	for word in re.split(r'(\s|\.|,|;|\[|\]|"[^"]*"|#[^\n]*\n|\([^()]*\))', code):
-		if word == "":
-			continue
-		if re.fullmatch(r'\s|\.|,|;|\[|\]|"[^"]*"|#[^\n]*\n|\([^()]*\)', word):
-			output += [Punctuation(word)]
-			continue
-		
-		cont = False
-		for number in CASE_REGEXES:
-			for case in CASE_REGEXES[number]:
-				if re.fullmatch(CASE_REGEXES[number][case], word):
-					bf = word[:word.index(":")]
-					cl = "lukusana" if re.fullmatch(r'\d+', bf) else "nimisana"
-					output += [AltWords(word, [Word(word, bf, case, number, cl)])]
-					cont = True
-		if cont:
-			continue
-		for case in ORDINAL_CASE_REGEXES:
-			if re.fullmatch(ORDINAL_CASE_REGEXES[case], word):
-				bf = word[:word.index(":")]
-				cl = "lukusana" if re.fullmatch(r'\d+', bf) else "nimisana"
-				output += [AltWords(word, [Word(word, bf, case, number, cl, ordinal_like=True)])]
-				cont = True
-		if cont:
-			continue
-		
-		analysis_list = voikko.analyze(word)
-		prefix = ""
-		if len(analysis_list) == 0 and "-" in word:
-			i = word.rindex("-")+1
-			analysis_list = voikko.analyze(word[i:])
-			prefix = word[:i].lower()
-		alternatives = []
-		for analysis in analysis_list:
-			bf = prefix+analysis["BASEFORM"]
-			cl = analysis["CLASS"]
-			if bf in ORDINALS+CARDINALS or re.fullmatch(r'\d+', bf):
-				cl = "lukusana"
-			elif "PARTICIPLE" in analysis and analysis["PARTICIPLE"] == "agent":
-				cl = "laatusana"
-			number = analysis.get("NUMBER", "")
-			person = analysis.get("PERSON", "")
-			comparison = analysis.get("COMPARISON", "")
-			possessive = analysis.get("POSSESSIVE", "")
-			ko_suffix = analysis.get("KYSYMYSLIITE", "") == "true"
-			if "MOOD" in analysis and "SIJAMUOTO" in analysis:
-				form = analysis["MOOD"] + "_" + analysis["SIJAMUOTO"]
-			elif "SIJAMUOTO" in analysis:
-				form = analysis["SIJAMUOTO"]
-			elif "MOOD" in analysis and "TENSE" in analysis:
-				form = analysis["MOOD"] + "_" + analysis["TENSE"]
-				if "NEGATIVE" in analysis and analysis["NEGATIVE"] == "true":
-					form += "_negative"
-			elif "MOOD" in analysis and analysis["MOOD"] == "E-infinitive":
-				if re.fullmatch(r'.*taess[aä]', word.lower()):
-					form = "E-infinitive_sisaolento"
-					person = "4"
-				elif re.fullmatch(r'.*taen', word.lower()):
-					form = "E-infinitive_keinonto"
-					person = "4"
-				elif re.fullmatch(r'.*ss[aä]', word.lower()):
-					form = "E-infinitive_sisaolento"
-					person = "3"
-				elif re.fullmatch(r'.*n', word.lower()):
-					form = "E-infinitive_keinonto"
-					person = "3"
-				else:
-					form = analysis["MOOD"]
-			elif "MOOD" in analysis:
-				form = analysis["MOOD"]
+	for word in words:
+		if isinstance(word, str):
+			output += [AltWords(word, wordAlternatives(word))]
+		else:
+			output += [word]
+	return output
+
+# sanan vaihtoehtoiset tulkinnat lasketaan kerran jokaiselle sanamuodolle
+WORD_CACHE_SIZE = 8192
+
+def setWordCacheSize(size):
+	global wordAlternatives
+	wordAlternatives = lru_cache(maxsize=size)(analyzeWord)
+
+def wordCacheInfo():
+	return wordAlternatives.cache_info()
+
+def analyzeWord(word):
+	colon_form = colonForm(word)
+	if colon_form:
+		case, number, ordinal_like = colon_form
+		bf = word[:word.index(":")]
+		cl = "lukusana" if re.fullmatch(r'\d+', bf) else "nimisana"
+		return (Word(word, bf, case, number, cl, ordinal_like=ordinal_like),)
+	
+	analysis_list = voikko.analyze(word)
+	prefix = ""
+	if len(analysis_list) == 0 and "-" in word:
+		i = word.rindex("-")+1
+		analysis_list = voikko.analyze(word[i:])
+		prefix = word[:i].lower()
+	alternatives = []
+	for analysis in analysis_list:
+		bf = prefix+analysis["BASEFORM"]
+		cl = analysis["CLASS"]
+		if bf in ORDINALS+CARDINALS or re.fullmatch(r'\d+', bf):
+			cl = "lukusana"
+		elif "PARTICIPLE" in analysis and analysis["PARTICIPLE"] == "agent":
+			cl = "laatusana"
+		number = analysis.get("NUMBER", "")
+		person = analysis.get("PERSON", "")
+		comparison = analysis.get("COMPARISON", "")
+		possessive = analysis.get("POSSESSIVE", "")
+		ko_suffix = analysis.get("KYSYMYSLIITE", "") == "true"
+		if "MOOD" in analysis and "SIJAMUOTO" in analysis:
+			form = analysis["MOOD"] + "_" + analysis["SIJAMUOTO"]
+		elif "SIJAMUOTO" in analysis:
+			form = analysis["SIJAMUOTO"]
+		elif "MOOD" in analysis and "TENSE" in analysis:
+			form = analysis["MOOD"] + "_" + analysis["TENSE"]
+			if "NEGATIVE" in analysis and analysis["NEGATIVE"] == "true":
+				form += "_negative"
+		elif "MOOD" in analysis and analysis["MOOD"] == "E-infinitive":
+			if re.fullmatch(r'.*taess[aä]', word.lower()):
+				form = "E-infinitive_sisaolento"
+				person = "4"
+			elif re.fullmatch(r'.*taen', word.lower()):
+				form = "E-infinitive_keinonto"
+				person = "4"
+			elif re.fullmatch(r'.*ss[aä]', word.lower()):
+				form = "E-infinitive_sisaolento"
+				person = "3"
+			elif re.fullmatch(r'.*n', word.lower()):
+				form = "E-infinitive_keinonto"
+				person = "3"
 			else:
-				form = ""
-			alternatives += [Word(word, bf, form + person, number, cl, possessive, comparison, interrogative=ko_suffix)]
-		if len(alternatives) == 0:
-			alternatives = [Word(word, word, "", "", "")]
-		output += [AltWords(word, alternatives)]
-	return TokenList(output)
+				form = analysis["MOOD"]
+		elif "MOOD" in analysis:
+			form = analysis["MOOD"]
+		else:
+			form = ""
+		alternatives += [Word(word, bf, form + person, number, cl, possessive, comparison, interrogative=ko_suffix)]
+	if len(alternatives) == 0:
+		alternatives = [Word(word, word, "", "", "")]
+	return tuple(alternatives)
+
+setWordCacheSize(WORD_CACHE_SIZE)
 
 class TokenList:
 	def __init__(self, tokens):
-		self.tokens = tokens
-		self.styles = [""]*len(tokens)
-		self.style_spans = [(False, False)]*len(tokens)
-		self.newlines = [False]*len(tokens)
-		self.indent_levels = [0]*len(tokens)
+		self.tokens = []
+		self.styles = []
+		self.style_spans = []
+		self.newlines = []
+		self.indent_levels = []
 		self.i = -1
 		
-		# rivinumero jokaiselle tokenille
-		self.lines = []
-		line = 1
+		# jokaisen tokenin alun paikka koodissa (merkkeinä) sekä koodin pituus, ja jokaisen rivinvaihdon paikka
+		self.offsets = [0]
+		self.newline_offsets = []
+		
+		# merkitsevien (muiden kuin tyhjien ja kommenttien) tokenien indeksit,
+		# ja jokaiselle indeksille k niiden merkitsevien tokenien määrä, joiden indeksi on pienempi kuin k
+		self.significant = []
+		self.rank = [0]
+		
+		# jokaiselle merkitsevälle tokenille seuraavan pilkun tai pisteen järjestysnumero merkitsevien tokenien joukossa,
+		# ja ensimmäinen järjestysnumero, jonka jälkeen ei vielä ole pilkkua tai pistettä
+		self.next_stop = [0]
+		self.pending_stop = 0
+		
+		self.indent_level = 0
+		self.extend(tokens)
+	def extend(self, tokens):
+		# lisää tokenit listan loppuun
+		first = len(self.tokens)
+		self.tokens += tokens
+		self.styles += [""]*len(tokens)
+		self.style_spans += [(False, False)]*len(tokens)
+		self.newlines += [False]*len(tokens)
+		self.indent_levels += [0]*len(tokens)
+		
 		for token in tokens:
 			token.tokens = self
-			line += token.token.count("\n")
-			self.lines.append(line)
+		offsets = list(accumulate((len(token.token) for token in tokens), initial=self.offsets[-1]))
+		self.newline_offsets += [offset + k
+			for offset, token in zip(offsets, tokens) if "\n" in token.token
+			for k, c in enumerate(token.token) if c == "\n"]
+		self.offsets += offsets[1:]
 		
-		self.indent_level = 0
+		self.rank.pop()
+		for j, token in enumerate(tokens, first):
+			self.rank.append(len(self.significant))
+			if token.isWord() or not token.isSpace():
+				self.significant.append(j)
+		self.rank.append(len(self.significant))
+		
+		# lasketaan uudelleen ne kohdat, joiden jälkeen ei aiemmin ollut pilkkua tai pistettä
+		n = len(self.significant)
+		pending = self.pending_stop
+		tail = [n]*(n+1-pending)
+		for r in reversed(range(pending, n)):
+			if self.tokens[self.significant[r]].token in [",", "."]:
+				tail[r-pending] = r
+				if self.pending_stop == pending:
+					self.pending_stop = r+1
+			else:
+				tail[r-pending] = tail[r-pending+1]
+		self.next_stop[pending:] = tail
 	def setPlace(self, i):
 		self.i = i
 	def place(self):
@@ -129,30 +230,19 @@ class TokenList:
 	def current(self):
 		return self.tokens[self.i]
 	def prev(self, n=1):
-		j = self.i<1
-		while j >= 0:
-			if self.tokens[j].isWord() or not self.tokens[j].isSpace():
-				n -= 1
-				if n == 0:
-					return self.tokens[j]
-			j -= 1
-		return None
+		if self.i < 0:
+			return None
+		r = self.rank[self.i] - n
+		return self.tokens[self.significant[r]] if r >= 0 else None
 	def peek(self, n=1):
-		j = self.i+1
-		while j < len(self.tokens):
-			if self.tokens[j].isWord() or not self.tokens[j].isSpace():
-				n -= 1
-				if n == 0:
-					return self.tokens[j]
-			j += 1
-		return None
+		r = self.rank[self.i+1] + n - 1
+		return self.tokens[self.significant[r]] if r < len(self.significant) else None
 	def next(self):
-		while self.i < len(self.tokens):
-			self.i += 1
-			self.indent_levels[self.i] = self.indent_level
-			if self.tokens[self.i].isWord() or not self.tokens[self.i].isSpace():
-				return self.tokens[self.i]
-		return None
+		r = self.rank[self.i+1]
+		j = self.significant[r] if r < len(self.significant) else len(self.tokens)-1
+		self.indent_levels[self.i+1:j+1] = [self.indent_level]*(j-self.i)
+		self.i = j
+		return self.tokens[j] if r < len(self.significant) else None
 	def eof(self):
 		return not self.peek()
 	def setStyle(self, style, continued=False):
@@ -179,19 +269,69 @@ class TokenList:
 				out += "<here>"
 			out += self.tokens[i].token
 		return out
+	# paikkojen hakeminen (kaikki O(log n))
+	def offset(self, place):
+		return self.offsets[place]
+	def tokenAt(self, offset):
+		return bisect.bisect_right(self.offsets, offset) - 1
+	def lineAt(self, offset):
+		return bisect.bisect_left(self.newline_offsets, offset) + 1
+	def lineStart(self, line):
+		return self.newline_offsets[line-2] + 1 if line > 1 else 0
+	def position(self, place):
+		# tokenin alun rivi ja sarake (alkavat ykkösestä)
+		offset = self.offsets[place]
+		line = self.lineAt(offset)
+		return line, offset - self.lineStart(line) + 1
 	def fancyContext(self, place):
-		a = max(0, place-10)
-		b = min(len(self.tokens), place+10)
-		out = "Line " + str(self.lines[place]) + ": "
-		column = 0
-		for i in range(a, b):
-			if i == place:
-				column = len(out)
-			if self.lines[i] == self.lines[place] and "\n" not in self.tokens[i].token:
-				out += self.tokens[i].token.replace("\t", " ")
+		# näytetään ne ympäröivät tokenit, jotka ovat samalla rivillä kuin tokenin loppu
+		end = self.offsets[place+1]
+		line = self.lineAt(end)
+		k = line-1
+		first = self.tokenAt(self.newline_offsets[k-1]) + 1 if k > 0 else 0
+		last = self.tokenAt(self.newline_offsets[k]) if k < len(self.newline_offsets) else len(self.tokens)
+		a = max(first, place-10)
+		b = min(last, place+10)
+		out = "Line " + str(line) + ": "
+		column = len(out) + max(0, self.offsets[place] - self.offsets[a])
+		if a < b:
+			out += "".join(token.token for token in self.tokens[a:b]).replace("\t", " ")
 		out += "\n" + " "*column + "^" + "~"*(len(self.tokens[place].token)-1)
 		return out
 
+# tokenlista, joka luetaan sanageneraattorista sitä mukaa, kun jäsennin etenee
+class StreamingTokenList(TokenList):
+	def __init__(self, words, threads=1):
+		TokenList.__init__(self, [])
+		self.words = words
+		self.threads = threads
+		self.complete = False
+		self.ensureLoaded()
+	def readMore(self):
+		words = list(islice(self.words, STREAM_BATCH_SIZE))
+		if words:
+			self.extend(makeTokens(words, self.threads))
+		else:
+			self.complete = True
+	def ensureLoaded(self):
+		# jäsennin katsoo enintään seuraavaan pilkkuun tai pisteeseen ja LOOKAHEAD tokenia eteenpäin
+		while not self.complete and self.next_stop[self.rank[self.i+1]] + LOOKAHEAD >= len(self.significant):
+			self.readMore()
+	def readAll(self):
+		while not self.complete:
+			self.readMore()
+	def setPlace(self, i):
+		self.i = i
+		self.ensureLoaded()
+	def next(self):
+		token = TokenList.next(self)
+		self.ensureLoaded()
+		return token
+	def fancyContext(self, place):
+		while not self.complete and (len(self.tokens) <= place+10 or self.newline_offsets[-1:] < [self.offsets[place+1]]):
+			self.readMore()
+		return TokenList.fancyContext(self, place)
+
 def eat(token, tokens):
 	if not tokens.eof():
 		next_token = tokens.peek().token.lower()
@@ -215,26 +355,44 @@ def accept(accepted, tokens):
 	return token
 
 def afterCommaThereIs(word, tokens):
-	i = 1
-	while tokens.peek(i) and tokens.peek(i).token not in [",", "."]:
-		i += 1
-	return tokens.peek(i) and tokens.peek(i).token == "," and tokens.peek(i+1) and tokens.peek(i+1).token.lower() == word
+	r = tokens.next_stop[tokens.rank[tokens.i+1]]
+	significant = tokens.significant
+	return (r+1 < len(significant)
+		and tokens.tokens[significant[r]].token == ","
+		and tokens.tokens[significant[r+1]].token.lower() == word)
 
 CARDINALS = ["nolla", "yksi", "kaksi", "kolme", "neljä", "viisi", "kuusi", "seitsemän", "kahdeksan", "yhdeksän", "kymmenen"]
 ORDINALS = ["ensimmäinen", "toinen", "kolmas", "neljäs", "viides", "kuudes", "seitsemäs", "kahdeksas", "yhdeksäs", "kymmenes"]
 
+# välimerkkitokenien lajit lasketaan kerran tokenia luodessa
+SPACE = 1
+COMMENT = 2
+STRING = 4
+
+def punctuationKind(token):
+	if re.fullmatch("#[^\n]*\n|\([^()]*\)", token):
+		return SPACE | COMMENT
+	elif re.fullmatch("\s*", token):
+		return SPACE
+	elif re.fullmatch(r'"[^"]*"', token):
+		return STRING
+	else:
+		return 0
+
 class Punctuation:
+	__slots__ = ("token", "tokens", "kind")
 	def __init__(self, token):
 		self.token = token
 		self.tokens = None
+		self.kind = punctuationKind(token)
 	def isWord(self):
 		return False
 	def isSpace(self):
-		return self.isComment() or not not re.fullmatch("\s*", self.token)
+		return self.kind & SPACE != 0
 	def isComment(self):
-		return not not re.fullmatch("#[^\n]*\n|\([^()]*\)", self.token)
+		return self.kind & COMMENT != 0
 	def isString(self):
-		return not not re.fullmatch(r'"[^"]*"', self.token)
+		return self.kind & STRING != 0
 	def toWord(self, cls=[], forms=[], numbers=[]):
 		syntaxError("unexpected token, expected a word", self.tokens)
 	def __str__(self):
@@ -242,11 +400,59 @@ class Punctuation:
 	def __repr__(self):
 		return "<Punctuation " + self.token + ">"
 
+# Tulkinnan valitseminen
+#
+# Jäsennin kutsuu toWord-metodia samalle tokenille monta kertaa eri toivelistoilla. Jokaisen
+# tulkinnan sanaluokka, muoto, vertailuaste ja luku muutetaan tokenisoinnin aikana kokonaisluvuiksi,
+# ja jokaiselle toivelistojen yhdistelmälle lasketaan kerran, kuinka monta kertaa kukin ominaisuus
+# esiintyy listoissa. Pisteet ovat samat kuin aiemmassa count-kutsuihin perustuvassa toteutuksessa
+# (myös silloin, kun forms on merkkijono), ja tokeni muistaa valintansa jokaiselle yhdistelmälle.
+
+FEATURE_CODES = {}
+FEATURE_NAMES = []
+FEATURE_LOCK = threading.Lock()
+
+def featureCode(feature):
+	code = FEATURE_CODES.get(feature)
+	if code is None:
+		with FEATURE_LOCK:
+			code = FEATURE_CODES.get(feature)
+			if code is None:
+				code = FEATURE_CODES[feature] = len(FEATURE_NAMES)
+				FEATURE_NAMES.append(feature)
+	return code
+
+# ominaisuuden koodi -> kuinka monta kertaa ominaisuus esiintyy toivelistassa (list.count tai str.count)
+class FeatureWeights(dict):
+	__slots__ = ("preferences",)
+	def __init__(self, preferences):
+		self.preferences = preferences
+	def __missing__(self, code):
+		weight = self[code] = self.preferences.count(FEATURE_NAMES[code])
+		return weight
+
+def preferenceKey(preferences):
+	return preferences if isinstance(preferences, str) else tuple(preferences)
+
+PREFERENCE_WEIGHTS = {}
+
+def preferenceWeights(key, cls, forms, numbers):
+	weights = PREFERENCE_WEIGHTS.get(key)
+	if weights is None:
+		weights = PREFERENCE_WEIGHTS[key] = (
+			FeatureWeights(cls), FeatureWeights(forms), FeatureWeights(numbers),
+			-2 if "nimisana" in cls else 0
+		)
+	return weights
+
 class AltWords:
+	__slots__ = ("token", "alternatives", "tokens", "choices")
 	def __init__(self, token, alternatives):
 		self.token = token
 		self.alternatives = alternatives
 		self.tokens = None
+		# toivelistat -> valittu tulkinta
+		self.choices = None
 	def isWord(self):
 		return True
 	def isSpace(self):
@@ -256,13 +462,27 @@ class AltWords:
 	def isString(self):
 		return False
 	def toWord(self, cls=[], forms=[], numbers=[]):
-		def score(w):
-			return (cls.count(w.word_class)
-				+ forms.count(w.form)
-				+ forms.count(w.comparison)
-				+ numbers.count(w.number)
-				+ (-2 if w.form == "keinonto" and "nimisana" in cls else 0))
-		return sorted(self.alternatives, key=score)[-1]
+		if len(self.alternatives) == 1:
+			return self.alternatives[0]
+		key = (preferenceKey(cls), preferenceKey(forms), preferenceKey(numbers))
+		if self.choices is None:
+			self.choices = {}
+		else:
+			word = self.choices.get(key)
+			if word is not None:
+				return word
+		cls_weights, form_weights, number_weights, keinonto_penalty = preferenceWeights(key, cls, forms, numbers)
+		best = best_score = None
+		for word in self.alternatives:
+			word_class, form, comparison, number = word.features
+			score = cls_weights[word_class] + form_weights[form] + form_weights[comparison] + number_weights[number]
+			if form == KEINONTO:
+				score += keinonto_penalty
+			# sorted(...)[-1] valitsi tasapelissä viimeisen vaihtoehdon
+			if best is None or score >= best_score:
+				best, best_score = word, score
+		self.choices[key] = best
+		return best
 	def __str__(self):
 		return self.token
 	def __repr__(self):
@@ -276,7 +496,10 @@ NUMERAL = ["lukusana"]
 VERB = ["teonsana", "kieltosana"]
 CONJ = ["sidesana"]
 
+KEINONTO = featureCode("keinonto")
+
 class Word:
+	__slots__ = ("word", "baseform", "form", "number", "word_class", "possessive", "ordinal_like", "comparison", "interrogative", "features")
 	def __init__(self, word, baseform, form, number, word_class, possessive="", comparison="", ordinal_like=False, interrogative=False):
 		#print(word, baseform, form, number, word_class)
 		self.word = word
@@ -288,6 +511,10 @@ class Word:
 		self.ordinal_like = ordinal_like
 		self.comparison = comparison
 		self.interrogative = interrogative
+		self.features = (featureCode(word_class), featureCode(form), featureCode(comparison), featureCode(number))
+	def __reduce__(self):
+		# koodit ovat prosessikohtaisia, joten ne lasketaan uudelleen, kun sana siirretään toiseen prosessiin
+		return (Word, (self.word, self.baseform, self.form, self.number, self.word_class, self.possessive, self.comparison, self.ordinal_like, self.interrogative))
 	def __str__(self):
 		return self.baseform + "(" + self.word_class + ":" + self.form + ":" + self.number + ")"
 	def __repr__(self):
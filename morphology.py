@@ -0,0 +1,132 @@
+# Tampio Compiler
+# Copyright (C) 2018 Iikka Hauhio
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import os, pickle, threading
+from concurrent.futures import ThreadPoolExecutor
+from voikko.libvoikko import Voikko
+
+# Voikon analyysien pysyvä välimuisti
+#
+# Välimuisti on tiedosto, joka sisältää sanakirjan version ja jokaisen analysoidun sanan analyysit.
+# Jos sanakirja vaihtuu, välimuisti hylätään. Tiedoston sijainnin voi vaihtaa ympäristömuuttujalla
+# TAMPIO_ANALYSIS_CACHE, ja tyhjä arvo poistaa pysyvän välimuistin käytöstä.
+
+CACHE_FORMAT = 1
+
+# lexCode käyttää vain näitä analyysin kenttiä, joten muita ei tallenneta
+ANALYSIS_KEYS = [
+	"BASEFORM", "CLASS", "COMPARISON", "KYSYMYSLIITE", "MOOD", "NEGATIVE",
+	"NUMBER", "PARTICIPLE", "PERSON", "POSSESSIVE", "SIJAMUOTO", "TENSE"
+]
+
+def defaultCacheFile():
+	if "TAMPIO_ANALYSIS_CACHE" in os.environ:
+		return os.environ["TAMPIO_ANALYSIS_CACHE"] or None
+	cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+	return os.path.join(cache_dir, "tampio", "analyses.pickle")
+
+def dictionaryVersion(language):
+	variant = language.split("-x-")[-1] if "-x-" in language else "standard"
+	dicts = [d for d in Voikko.listDicts() if d.variant == variant]
+	return (CACHE_FORMAT, Voikko.getVersion(), language, tuple(sorted(repr(d) for d in dicts)))
+
+def packAnalyses(analysis_list):
+	return tuple(tuple((key, a[key]) for key in ANALYSIS_KEYS if key in a) for a in analysis_list)
+
+def unpackAnalyses(packed):
+	return [dict(a) for a in packed]
+
+class AnalysisCache:
+	def __init__(self, language, filename=None):
+		self.language = language
+		self.filename = filename
+		self.version = None
+		self.analyses = None
+		self.new_words = set()
+		self.handles = []
+		# välimuistia voidaan käyttää useasta säikeestä, esim. kun useita tiedostoja käännetään yhtä aikaa
+		self.lock = threading.RLock()
+	def load(self):
+		self.analyses = {}
+		if not self.filename:
+			return
+		self.version = dictionaryVersion(self.language)
+		self.analyses = self.readFile()
+	def readFile(self):
+		try:
+			with open(self.filename, "rb") as f:
+				version, analyses = pickle.load(f)
+		except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+			return {}
+		return analyses if version == self.version else {}
+	def voikkoHandles(self, n):
+		# Voikko-oliota ei saa käyttää kahdesta säikeestä yhtä aikaa, joten jokaisella säikeellä on omansa
+		while len(self.handles) < n:
+			self.handles.append(Voikko(self.language))
+		return self.handles[:n]
+	def analyze(self, word):
+		with self.lock:
+			return self.analyzeUnlocked(word)
+	def analyzeUnlocked(self, word):
+		if self.analyses is None:
+			self.load()
+		if word not in self.analyses:
+			self.analyses[word] = packAnalyses(self.voikkoHandles(1)[0].analyze(word))
+			self.new_words.add(word)
+		return unpackAnalyses(self.analyses[word])
+	def analyzeAll(self, words, threads=1):
+		with self.lock:
+			self.analyzeAllUnlocked(words, threads)
+	def analyzeAllUnlocked(self, words, threads):
+		if self.analyses is None:
+			self.load()
+		missing = sorted(word for word in words if word not in self.analyses)
+		if not missing:
+			return
+		threads = max(1, min(threads, len(missing)))
+		handles = self.voikkoHandles(threads)
+		chunks = [missing[i::threads] for i in range(threads)]
+		def analyzeChunk(voikko, chunk):
+			return [packAnalyses(voikko.analyze(word)) for word in chunk]
+		if threads == 1:
+			results = [analyzeChunk(handles[0], chunks[0])]
+		else:
+			with ThreadPoolExecutor(threads) as pool:
+				results = list(pool.map(analyzeChunk, handles, chunks))
+		for chunk, analyses in zip(chunks, results):
+			for word, packed in zip(chunk, analyses):
+				self.analyses[word] = packed
+				self.new_words.add(word)
+	def save(self):
+		with self.lock:
+			self.saveUnlocked()
+	def saveUnlocked(self):
+		if not self.filename or not self.new_words:
+			return
+		# toinen prosessi on voinut kirjoittaa tiedostoon välissä, joten yhdistetään
+		analyses = self.readFile()
+		for word in self.new_words:
+			analyses[word] = self.analyses[word]
+		tmp_file = self.filename + "." + str(os.getpid()) + ".tmp"
+		try:
+			if os.path.dirname(self.filename):
+				os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+			with open(tmp_file, "wb") as f:
+				pickle.dump((self.version, analyses), f, pickle.HIGHEST_PROTOCOL)
+			os.replace(tmp_file, self.filename)
+		except OSError:
+			return
+		self.new_words = set()
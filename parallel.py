@@ -0,0 +1,175 @@
+# Tampio Compiler
+# Copyright (C) 2018 Iikka Hauhio
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from fatal_error import TampioSyntaxError
+from grammar import ParserContext, parseDeclaration
+
+# Määrittelyjen rinnakkainen jäsentäminen
+#
+# Peräkkäinen jäsennin aloittaa jokaisen määrittelyn joko tiedoston alusta tai edellisen määrittelyn
+# päättävän pisteen kohdalta. Tokenlista jaetaan näiden kohtien perusteella väleihin, jotka jäsennetään
+# aliprosesseissa. Jokainen aliprosessi palauttaa välin määrittelyn (tai virheen) sekä tokenien tyylit,
+# rivinvaihdot ja sisennykset.
+#
+# Pääprosessi yhdistää tulokset lähdekoodin järjestyksessä. Välin tulosta käytetään vain, jos sen
+# jäsentäminen alkoi samasta tilasta kuin peräkkäisessä jäsentämisessä ja päättyi välin loppuun.
+# Muuten kyseinen kohta jäsennetään uudelleen pääprosessissa, joten tulos on aina sama kuin
+# peräkkäisessä jäsentämisessä. salli- ja kiellä-määrittelyt muuttavat jäsentimen asetuksia, joten
+# jokaisen välin alussa voimassa olevat asetukset lasketaan etukäteen.
+#
+# Virheellinen määrittely voi jättää jälkeensä sisennystason ja jokainen-pinon kehyksiä, jotka
+# vaikuttavat myöhempiin määrittelyihin. Aliprosessi jäsentää välin aina tyhjästä tilasta ja kertoo,
+# kuinka paljon sisennystaso muuttui ja mitkä kehykset jäivät pinoon, jotta pääprosessi voi lisätä ne
+# omaan tilaansa. Jos määrittely käyttää pinon pohjalla olevaa kehystä, sen tulos riippuu aiemmista
+# määrittelyistä, ja se jäsennetään uudelleen, ellei pino ole pääprosessissa tyhjä.
+
+SPANS_PER_TASK = 64
+
+# välin alkua merkitsevä tyyli, jonka avulla huomataan, jos setStyle(continued=True) ulottuu välin ulkopuolelle
+BOUNDARY_STYLE = "\0"
+
+def significantToken(tokens, rank):
+	if rank < len(tokens.significant):
+		return tokens.tokens[tokens.significant[rank]]
+	return None
+
+def declarationSpans(tokens):
+	periods = [j for j in tokens.significant if tokens.tokens[j].token == "."]
+	starts = [-1] + periods
+	options = ParserContext().options
+	spans = []
+	for k, start in enumerate(starts):
+		first = significantToken(tokens, tokens.rank[start+1])
+		if first is None:
+			break
+		end = starts[k+1] if k+1 < len(starts) else None
+		spans.append((start, end, dict(options)))
+		second = significantToken(tokens, tokens.rank[start+1]+1)
+		if first.token.lower() in ["salli", "kiellä"] and second and second.isWord():
+			options[second.token.lower()] = first.token.lower() == "salli"
+	return spans
+
+# jokainen-pinon pohjalle asetettava kehys, joka ei salli yhtään muuttujatyyppiä ja muistaa, jos sitä on käytetty
+class BaseFrameTypes:
+	def __init__(self):
+		self.used = False
+	def __contains__(self, var_type):
+		self.used = True
+		return False
+
+def parseSpan(tokens, start, end, options):
+	last = end if end is not None else len(tokens.tokens)-1
+	first = start+1
+	tokens.styles[first:last+1] = [""]*(last+1-first)
+	tokens.style_spans[first:last+1] = [(False, False)]*(last+1-first)
+	tokens.newlines[first:last+1] = [False]*(last+1-first)
+	boundary_style = tokens.styles[start]
+	boundary_span = tokens.style_spans[start]
+	tokens.styles[start] = BOUNDARY_STYLE
+	tokens.setPlace(start)
+	tokens.indent_level = 0
+	context = ParserContext()
+	context.options = dict(options)
+	base_frame = BaseFrameTypes()
+	context.for_stack.append((base_frame, []))
+	decl = error = None
+	try:
+		try:
+			decl = parseDeclaration(tokens, context)
+		except TampioSyntaxError as e:
+			error = (e.msg, e.place)
+			while not tokens.eof() and tokens.next().token != ".":
+				pass
+		ok = ((tokens.place() == end if end is not None else tokens.eof())
+			and context.for_stack[:1] == [(base_frame, [])]
+			and tokens.styles[start] == BOUNDARY_STYLE
+			and tokens.style_spans[start] == boundary_span)
+	except Exception:
+		ok = False
+	finally:
+		tokens.styles[start] = boundary_style
+		tokens.style_spans[start] = boundary_span
+	if not ok:
+		return None
+	place = tokens.place()
+	return (decl, error, place, context.options, tokens.indent_level, context.for_stack[1:], base_frame.used,
+		tokens.styles[first:place+1], tokens.style_spans[first:place+1],
+		tokens.newlines[first:place+1], tokens.indent_levels[first:place+1])
+
+WORKER_TOKENS = None
+
+def initializeWorker(tokens):
+	global WORKER_TOKENS
+	WORKER_TOKENS = tokens
+
+def parseSpans(spans):
+	return [parseSpan(WORKER_TOKENS, start, end, options) for start, end, options in spans]
+
+def poolContext():
+	if "fork" in multiprocessing.get_all_start_methods():
+		return multiprocessing.get_context("fork")
+	return multiprocessing.get_context()
+
+def parseSpansInParallel(tokens, spans, processes):
+	tasks = [spans[i:i+SPANS_PER_TASK] for i in range(0, len(spans), SPANS_PER_TASK)]
+	with ProcessPoolExecutor(processes, mp_context=poolContext(), initializer=initializeWorker, initargs=(tokens,)) as pool:
+		results = []
+		for task_results in pool.map(parseSpans, tasks):
+			results += task_results
+	return results
+
+def parseDeclarationsInParallel(tokens, context, processes, report_error):
+	spans = declarationSpans(tokens)
+	results = parseSpansInParallel(tokens, spans, processes)
+	return mergeSpans(tokens, context, spans, results, report_error)
+
+# yhdistää välien tulokset, results[k] on välin spans[k] parseSpan-funktion palauttama tulos tai None
+def mergeSpans(tokens, context, spans, results, report_error):
+	span_index = {start: k for k, (start, _, _) in enumerate(spans)}
+	decls = []
+	while not tokens.eof():
+		k = span_index.get(tokens.place())
+		result = results[k] if k is not None else None
+		if (result
+			and context.options == spans[k][2]
+			and (not result[6] or not context.for_stack)):
+			start = spans[k][0]
+			decl, error, place, options, indent_delta, for_frames, _, styles, style_spans, newlines, indent_levels = result
+			tokens.styles[start+1:place+1] = styles
+			tokens.style_spans[start+1:place+1] = style_spans
+			tokens.newlines[start+1:place+1] = newlines
+			tokens.indent_levels[start+1:place+1] = [level + tokens.indent_level for level in indent_levels]
+			tokens.indent_level += indent_delta
+			tokens.setPlace(place)
+			context.options = dict(options)
+			context.for_stack += for_frames
+			if error:
+				e = TampioSyntaxError("", tokens, error[1])
+				e.msg = error[0]
+				report_error(e)
+			else:
+				decls.append(decl)
+		else:
+			# jäsennetään peräkkäin, kunnes ollaan taas jonkin välin alussa
+			try:
+				decls.append(parseDeclaration(tokens, context))
+			except TampioSyntaxError as e:
+				report_error(e)
+				while not tokens.eof() and tokens.next().token != ".":
+					pass
+	return decls
@@ -0,0 +1,151 @@
+# Tampio Compiler
+# Copyright (C) 2018 Iikka Hauhio
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import json, time
+from functools import wraps
+
+import ast, inflect, lex, morphology, parallel
+
+# Käännöksen vaiheiden ajanotto (tampio.py --profile)
+#
+# install korvaa vaiheiden funktiot kääreillä, jotka laskevat kutsut ja mittaavat ajan, joten
+# ilman --profile-valitsinta ajanotosta ei ole mitään haittaa. Jokaiselle vaiheelle lasketaan vain
+# sen oma aika: kun vaihe kutsuu toista vaihetta (esim. paloittain lukeva lekseri jäsentämisen aikana
+# tai Voikko tokenisoinnin aikana), kello siirtyy sisemmälle vaiheelle. Vaiheisiin kuulumaton aika
+# merkitään muuksi, joten tiedoston vaiheiden ajat ovat yhteensä sen koko käännösaika.
+#
+# Aika kirjataan sille lähdetiedostolle, jota käännetään (ks. source), joten std.itp:n ja käyttäjän
+# tiedoston ajat näkyvät erikseen. Rinnakkaisen jäsentimen aliprosesseja ei mitata, vaan niiden
+# työ näkyy jäsentämisenä pääprosessin odotusaikana.
+
+OTHER = "other"
+
+class Profiler:
+	def __init__(self):
+		# (lähdetiedosto, vaihe) -> [kääreiden kutsut, sekunnit]
+		self.stats = {}
+		self.sources = []
+		# (lähdetiedosto, vaihe) -pareja, pinon päällimmäinen vaihe saa ajan
+		self.stack = []
+		self.started = None
+	def enter(self, source, phase):
+		now = time.perf_counter()
+		if self.stack:
+			self.stats[self.stack[-1]][1] += now - self.started
+		key = (source, phase)
+		if key not in self.stats:
+			self.stats[key] = [0, 0.0]
+			if source not in self.sources:
+				self.sources.append(source)
+		self.stats[key][0] += 1
+		self.stack.append(key)
+		self.started = now
+	def exit(self):
+		now = time.perf_counter()
+		self.stats[self.stack.pop()][1] += now - self.started
+		self.started = now
+	def source(self, name):
+		return SourceFrame(self, name)
+	def phase(self, phase):
+		source = self.stack[-1][0] if self.stack else OTHER
+		self.enter(source, phase)
+	def report(self):
+		# lähdetiedosto -> vaihe -> {"calls": kutsut, "seconds": sekunnit}, tiedostot käännösjärjestyksessä
+		return {
+			source: {
+				phase: {"calls": calls, "seconds": seconds}
+				for (s, phase), (calls, seconds) in sorted(self.stats.items(), key=lambda item: -item[1][1])
+				if s == source
+			}
+			for source in self.sources
+		}
+	def writeText(self, stream):
+		for source, phases in self.report().items():
+			total = sum(phase["seconds"] for phase in phases.values())
+			stream.write("%s: %.1f ms\n" % (source, total*1000))
+			for name, phase in phases.items():
+				calls = "" if name == OTHER else "%d calls" % phase["calls"]
+				stream.write("  %-18s %12s %10.1f ms %5.1f%%\n" % (name, calls, phase["seconds"]*1000, 100*phase["seconds"]/total if total else 0))
+	def writeJSON(self, stream):
+		stream.write(json.dumps(self.report(), ensure_ascii=False) + "\n")
+
+class SourceFrame:
+	def __init__(self, profiler, name):
+		self.profiler = profiler
+		self.name = name
+	def __enter__(self):
+		self.profiler.enter(self.name, OTHER)
+	def __exit__(self, *args):
+		self.profiler.exit()
+
+class NullProfiler:
+	def source(self, name):
+		return NullFrame()
+
+class NullFrame:
+	def __enter__(self):
+		pass
+	def __exit__(self, *args):
+		pass
+
+PROFILER = NullProfiler()
+
+def timed(function, phase):
+	@wraps(function)
+	def wrapper(*args, **kwargs):
+		PROFILER.phase(phase)
+		try:
+			return function(*args, **kwargs)
+		finally:
+			PROFILER.exit()
+	wrapper.profiled_function = function
+	return wrapper
+
+def instrument(owner, name, phase):
+	function = owner.__dict__[name] if isinstance(owner, type) else getattr(owner, name)
+	if not hasattr(function, "profiled_function"):
+		setattr(owner, name, timed(function, phase))
+
+def instrumentMethod(base, name, phase):
+	# korvaa metodin kantaluokassa ja kaikissa aliluokissa, jotka määrittelevät sen uudelleen
+	classes = [base]
+	while classes:
+		cls = classes.pop()
+		if name in cls.__dict__:
+			instrument(cls, name, phase)
+		classes += cls.__subclasses__()
+
+def install(main_module):
+	# main_module on tampio-moduuli, joka on tuonut osan funktioista omaan nimiavaruuteensa
+	global PROFILER
+	if isinstance(PROFILER, Profiler):
+		return PROFILER
+	PROFILER = Profiler()
+	instrument(main_module, "lexCode", "lexing")
+	instrument(lex.StreamingTokenList, "readMore", "lexing")
+	instrument(morphology.AnalysisCache, "analyze", "voikko.analyze")
+	instrument(morphology.AnalysisCache, "analyzeAll", "voikko.analyze")
+	instrument(inflect, "inflect_word", "inflect_word")
+	for module in [main_module, parallel]:
+		instrument(module, "parseDeclaration", "parseDeclaration")
+	instrument(main_module, "parseDeclarationsInParallel", "parseDeclaration")
+	instrumentMethod(ast.Decl, "buildHierarchy", "buildHierarchy")
+	instrumentMethod(ast.Decl, "validateTree", "validateTree")
+	instrument(ast.Expr, "inferType", "inferType")
+	instrumentMethod(ast.Decl, "compile", "compile")
+	instrumentMethod(ast.Decl, "compileAdditionalStatements", "compile")
+	instrument(main_module, "prettyPrint", "highlighting")
+	return PROFILER
@@ -17,48 +17,74 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import argparse, readline, sys, traceback, os
-from fatal_error import TampioSyntaxError
-from lex import lexCode
-from grammar import initializeParser, parseDeclaration
+from fatal_error import TampioSyntaxError, writeErrorsJSON
+from lex import lexCode, lexFile
+from grammar import ParserContext, parseDeclaration
 from highlighter import prettyPrint, HIGHLIGHTERS
-from ast import initializeCompiler, compileModule
+from ast import CompilerContext, JSWriter, compileModule
+from parallel import parseDeclarationsInParallel
+import profiler
 
 DEBUG = False
 PRINT_INCLUDED = False
+ANALYSIS_THREADS = 1
+PARSE_PROCESSES = 1
 
 included_code = ""
 
-def includeFile(filename):
+def includeFile(filename, context):
 	global included_code
-	with open(filename) as f:
-		_, ans, _ = compileCode(f.read())
+	with open(filename) as f, profiler.PROFILER.source(os.path.basename(filename)):
+		_, ans, _ = compileCode(f, context)
 		if PRINT_INCLUDED:
 			included_code += ans
 
-def compileCode(code):
-	tokens = lexCode(code)
-	decls = []
+# code voi olla myös tiedosto, joka luetaan paloittain jäsentämisen edetessä
+# incremental_parser on IncrementalParser, joka muistaa edellisen käännetyn koodin (ks. incremental.py)
+# jos errors on lista, virheet lisätään siihen ErrorRecord-tietueina eikä niitä tulosteta
+# jos stream on annettu, käännetty koodi kirjoitetaan siihen määrittely kerrallaan eikä sitä palauteta
+def compileCode(code, context=None, incremental_parser=None, errors=None, stream=None):
+	if context is None:
+		context = CompilerContext(includeFile)
 	num_errors = 0
-	def handleError(e):
+	def reportError(e):
 		nonlocal num_errors
 		if DEBUG:
 			traceback.print_exc()
+		elif errors is not None:
+			errors.append(e.record())
 		else:
 			e.printMe(sys.stderr)
+		num_errors += 1
+	def handleError(e):
+		reportError(e)
 		while not tokens.eof() and tokens.next().token != ".":
 			pass
-		num_errors += 1
-	initializeParser()
-	while not tokens.eof():
-		try:
-			decls += [parseDeclaration(tokens)]
-		except TampioSyntaxError as e:
-			handleError(e)
-	target_code = compileModule(decls, handleError, tokens)
+	if incremental_parser:
+		tokens, decls, _ = incremental_parser.update(code, reportError)
+	else:
+		parallel = PARSE_PROCESSES > 1 and not DEBUG
+		if isinstance(code, str):
+			tokens = lexCode(code, ANALYSIS_THREADS)
+		elif parallel:
+			# rinnakkainen jäsennin tarvitsee kaikki tokenit kerralla
+			tokens = lexCode(code.read(), ANALYSIS_THREADS)
+		else:
+			tokens = lexFile(code, ANALYSIS_THREADS)
+		decls = []
+		parser_context = ParserContext()
+		if parallel:
+			decls = parseDeclarationsInParallel(tokens, parser_context, PARSE_PROCESSES, reportError)
+		while not tokens.eof():
+			try:
+				decls += [parseDeclaration(tokens, parser_context)]
+			except TampioSyntaxError as e:
+				handleError(e)
+	target_code = compileModule(decls, handleError, tokens, context, stream and JSWriter(stream))
 	return tokens, target_code, num_errors
 
-def createHTML(code):
-	tokens, compiled, _ = compileCode(code)
+def createHTML(code, context=None, errors=None):
+	tokens, compiled, _ = compileCode(code, context, errors=errors)
 	ans = """<!DOCTYPE html><html><head><meta charset="utf-8" /><title>Imperatiivinen Tampio</title>"""
 	if not PRINT_INCLUDED:
 		ans += """<script type="text/javascript" src="itp.js" charset="utf-8"></script>"""
@@ -70,8 +96,8 @@ def createHTML(code):
 	ans += """\ndocument.avautua_A__N();\n</script></div></div></body></html>"""
 	return ans
 
-def createLatex(code):
-	tokens, _, _ = compileCode(code)
+def createLatex(code, context=None, errors=None):
+	tokens, _, _ = compileCode(code, context, errors=errors)
 	ans = """\\documentclass{article}\\usepackage[utf8]{inputenc}\\usepackage[T1]{fontenc}\\usepackage[finnish]{babel}"""
 	ans += """\\title{Tampiokoodi}"""
 	ans += """\\begin{document}\\setlength\\emergencystretch{\\hsize}"""
@@ -84,13 +110,17 @@ COMPILER_VERSION = "1.57"
 VERSION_STRING = "Tampio " + TAMPIO_VERSION + " Compiler " + COMPILER_VERSION
 
 def main():
-	global DEBUG, PRINT_INCLUDED
+	global DEBUG, PRINT_INCLUDED, ANALYSIS_THREADS, PARSE_PROCESSES
 	parser = argparse.ArgumentParser(description='Compile Tampio to JavaScript.')
 	parser.add_argument('-v', '--version', help='show version number and exit', action='store_true')
 	parser.add_argument('--debug', help='enable debug mode', action='store_true')
 	compiler_group = parser.add_argument_group('compiler options')
 	compiler_group.add_argument('filename', type=str, nargs='?', help='source code file')
 	compiler_group.add_argument('-i', '--print-included', help='print all included files in addition to the given file', action='store_true')
+	compiler_group.add_argument('--analysis-threads', type=int, default=1, metavar='N', help='analyze words using N threads (default: 1)')
+	compiler_group.add_argument('--parse-processes', type=int, default=1, metavar='N', help='parse declarations in parallel using N processes (default: 1)')
+	compiler_group.add_argument('--error-format', choices=['text', 'json'], default='text', help='print errors as text with context or as a single JSON list at the end (default: text)')
+	compiler_group.add_argument('--profile', nargs='?', choices=['text', 'json'], const='text', metavar='FORMAT', help='print the time spent in each compiler phase to stderr as text or json (default: text)')
 	output_mode = compiler_group.add_mutually_exclusive_group()
 	output_mode.add_argument('-s', '--syntax-markup', type=str, choices=HIGHLIGHTERS.keys(), help='do not compile, instead print the source code with syntax markup')
 	output_mode.add_argument('-p', '--html-page', help='print a html page containing both compiled code and syntax markup', action='store_true')
@@ -109,41 +139,66 @@ def main():
 	if args.print_included:
 		PRINT_INCLUDED = True
 	
-	initializeCompiler(includeFile)
+	ANALYSIS_THREADS = args.analysis_threads
+	PARSE_PROCESSES = args.parse_processes
+	
+	if args.profile:
+		profiler.install(sys.modules[__name__])
+	
+	def writeProfile():
+		if args.profile == "json":
+			profiler.PROFILER.writeJSON(sys.stderr)
+		elif args.profile:
+			profiler.PROFILER.writeText(sys.stderr)
+	
+	context = CompilerContext(includeFile)
+	
+	# JSON-muodossa virheet kerätään listaan ja tulostetaan kerralla käännöksen jälkeen
+	errors = [] if args.error_format == "json" else None
 	
 	# ladataan standardikirjasto
-	includeFile(os.path.join(os.path.dirname(__file__), "std.itp"))
+	includeFile(os.path.join(os.path.dirname(__file__), "std.itp"), context)
 	
 	if args.filename:
-		with open(args.filename) as f:
-			code = f.read()
+		with open(args.filename) as f, profiler.PROFILER.source(args.filename):
+			n = 0
 			if args.html_page:
-				print(createHTML(code))
+				print(createHTML(f.read(), context, errors))
 			elif args.latex_document:
-				print(createLatex(code))
-			else:
-				tokens, compiled, n = compileCode(code)
+				print(createLatex(f.read(), context, errors))
+			elif args.validate_syntax or args.syntax_markup:
+				tokens, _, n = compileCode(f, context, errors=errors)
 				if args.validate_syntax:
 					print("OK" if n == 0 else "ERROR")
-				elif args.syntax_markup:
-					print(prettyPrint(tokens, args.syntax_markup))
 				else:
-					print(included_code+compiled)
-				if n > 0:
-					sys.exit(1)
+					print(prettyPrint(tokens, args.syntax_markup))
+			else:
+				sys.stdout.write(included_code)
+				_, _, n = compileCode(f, context, errors=errors, stream=sys.stdout)
+				print()
+			if errors is not None:
+				writeErrorsJSON(errors, sys.stderr)
+		writeProfile()
+		if n > 0:
+			sys.exit(1)
 	else:
 		while True:
 			try:
 				code = input(">>> ")
-				tokens, compiled, _ = compileCode(code)
+				with profiler.PROFILER.source("<stdin>"):
+					tokens, compiled, _ = compileCode(code, context, errors=errors)
 				if args.validate_syntax:
 					print("OK" if n == 0 else "ERROR")
 				elif args.syntax_markup:
 					print(prettyPrint(tokens, args.syntax_markup))
 				else:
 					print(compiled)
+				if errors is not None:
+					writeErrorsJSON(errors, sys.stderr)
+					errors.clear()
 			except EOFError:
 				print("")
+				writeProfile()
 				break
 			except Exception:
 				traceback.print_exc()
@@ -26,17 +26,20 @@ import voikko.voikkoinfl as voikkoinfl
 import os
 import sys
 import locale
+import hashlib
+import pickle
+from bisect import bisect_left
 import voikko.voikkoutils as voikkoutils
 
 SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
 
 NOUN_AFFIX_FILE = os.path.join(SCRIPT_DIR, 'subst.aff')
 VERB_AFFIX_FILE = os.path.join(SCRIPT_DIR, 'verb.aff')
+WORD_LIST_FILE = os.path.join(SCRIPT_DIR, 'sanat.txt')
+SNAPSHOT_FILE = os.path.join(SCRIPT_DIR, 'inflection_tables.pickle')
+SNAPSHOT_FORMAT = 2
 PARAM_ENCODING = 'UTF-8'
 
-noun_types = voikkoinfl.readInflectionTypes(NOUN_AFFIX_FILE)
-verb_types = voikkoinfl.readInflectionTypes(VERB_AFFIX_FILE)
-
 def word_and_infl_class(fullclass):
 	infclass_parts = fullclass.split('-')
 	if len(infclass_parts) == 2:
@@ -66,16 +69,10 @@ def inflect_word(word, classes=None):
 		elif len(word) > 3 and word[-2:] in ["ja", "jä"]:
 			classes = "subst-kulkija"
 		else:
-			def end_similarity(word2):
-				i = 0
-				while i < min(len(word), len(word2)):
-					if word[-i-1] != word2[-i-1]:
-						break
-					i += 1
-				return i
-			mirror = sorted(list(WORD_CLASSES), key=end_similarity)[-1]
+			mirror = ending_index().closest(word)
 			classes = WORD_CLASSES[mirror]
 			WORD_CLASSES[word] = classes
+			ending_index().add(word)
 			#raise(Exception("Unknown word '" + word + "'"))
 	(wclass, infclass) = word_and_infl_class(classes)
 	if wclass == u'verbi': itypes = verb_types
@@ -85,12 +82,109 @@ def inflect_word(word, classes=None):
 		ans[iword.formName] = iword.inflectedWord
 	return ans
 
-WORD_CLASSES = {}
+# Index of words sorted by their reversed form. Finds the word that has the
+# longest common ending with the given word. Of equally good candidates the
+# one added last to WORD_CLASSES is chosen.
+class EndingIndex:
+	def __init__(self, words):
+		self.words = list(words)
+		reversed_words = [w[::-1] for w in self.words]
+		self.order = sorted(range(len(self.words)), key=reversed_words.__getitem__)
+		self.reversed_words = [reversed_words[i] for i in self.order]
+	def add(self, word):
+		r = word[::-1]
+		i = bisect_left(self.reversed_words, r)
+		self.reversed_words.insert(i, r)
+		self.order.insert(i, len(self.words))
+		self.words.append(word)
+	def closest(self, word):
+		r = word[::-1]
+		# the longest common ending is shared with one of the neighbours of the insertion point
+		i = bisect_left(self.reversed_words, r)
+		length = 0
+		for j in [i-1, i]:
+			if 0 <= j < len(self.reversed_words):
+				length = max(length, common_prefix_length(r, self.reversed_words[j]))
+		prefix = r[:length]
+		start = bisect_left(self.reversed_words, prefix)
+		end = bisect_left(self.reversed_words, prefix + u'\U0010ffff', start)
+		return self.words[max(self.order[start:end])]
+
+def common_prefix_length(a, b):
+	i = 0
+	while i < min(len(a), len(b)) and a[i] == b[i]:
+		i += 1
+	return i
+
+ENDING_INDEX = None
+
+def ending_index():
+	global ENDING_INDEX
+	if ENDING_INDEX is None:
+		ENDING_INDEX = EndingIndex(WORD_CLASSES)
+	return ENDING_INDEX
+
+# The word list and the affix files are parsed once and stored in a binary
+# snapshot next to them. The snapshot contains a hash of the source files and
+# is rebuilt automatically when they change.
+
+def read_word_classes():
+	word_classes = {}
+	with open(WORD_LIST_FILE) as f:
+		for line in f:
+			line = line.strip()
+			i = line.index(";")
+			word = line[:i].replace("=", "")
+			classes = line[i+1:]
+			word_classes[word] = classes
+	return word_classes
+
+def read_tables():
+	return (read_word_classes(),
+		voikkoinfl.readInflectionTypes(NOUN_AFFIX_FILE),
+		voikkoinfl.readInflectionTypes(VERB_AFFIX_FILE))
+
+def source_hash():
+	h = hashlib.sha1()
+	h.update(str(SNAPSHOT_FORMAT).encode())
+	for file_name in [WORD_LIST_FILE, NOUN_AFFIX_FILE, VERB_AFFIX_FILE]:
+		with open(file_name, 'rb') as f:
+			h.update(f.read())
+	return h.hexdigest()
+
+def load_snapshot(expected_hash):
+	try:
+		with open(SNAPSHOT_FILE, 'rb') as f:
+			snapshot_hash, tables = pickle.loads(f.read())
+	except (OSError, EOFError, ValueError, TypeError, AttributeError, pickle.UnpicklingError):
+		return None
+	if snapshot_hash != expected_hash:
+		return None
+	return tables
+
+def build_snapshot(tables=None, snapshot_hash=None):
+	if tables is None:
+		tables = read_tables()
+	if snapshot_hash is None:
+		snapshot_hash = source_hash()
+	tmp_file = SNAPSHOT_FILE + '.' + str(os.getpid()) + '.tmp'
+	try:
+		with open(tmp_file, 'wb') as f:
+			pickle.dump((snapshot_hash, tables), f, pickle.HIGHEST_PROTOCOL)
+		os.replace(tmp_file, SNAPSHOT_FILE)
+	except OSError:
+		pass
+	return tables
+
+def load_tables():
+	snapshot_hash = source_hash()
+	tables = load_snapshot(snapshot_hash)
+	if tables is None:
+		tables = build_snapshot(read_tables(), snapshot_hash)
+	return tables
+
+WORD_CLASSES, noun_types, verb_types = load_tables()
 
-with open(os.path.join(SCRIPT_DIR, 'sanat.txt')) as f:
-	for line in f:
-		line = line.strip()
-		i = line.index(";")
-		word = line[:i].replace("=", "")
-		classes = line[i+1:]
-		WORD_CLASSES[word] = classes
+if __name__ == '__main__':
+	build_snapshot()
+	print('Wrote ' + SNAPSHOT_FILE)
@@ -40,6 +40,7 @@ class InflectionRule:
 		self.delSuffix = u""
 		self.addSuffix = u""
 		self.gradation = voikkoutils.GRAD_WEAK
+		self.hunspellRules = None
 
 class InflectionType:
 	"Word inflection type"
@@ -51,6 +52,7 @@ class InflectionType:
 		self.gradation = voikkoutils.GRAD_NONE
 		self.note = u""
 		self.inflectionRules = []
+		self.matchRegex = None
 	
 	"Return the given word with suffix removed"
 	def removeSuffix(self, word):
@@ -365,16 +367,37 @@ def __word_pattern_to_pcre(pattern):
 # Public functions
 
 
+# List of inflection types that also indexes the types by their Joukahainen classes.
+# The index keeps the order of the list, so inflectWord finds the same type as
+# a linear search would.
+class InflectionTypeList(list):
+	def __init__(self, inflection_types=()):
+		list.__init__(self, inflection_types)
+		self.byJoukahainenClass = {}
+		for inflection_type in self:
+			for infclass in inflection_type.joukahainenClasses:
+				classTypes = self.byJoukahainenClass.setdefault(infclass, [])
+				if not inflection_type in classTypes: classTypes.append(inflection_type)
+
+# Compiles the word pattern and converts the rules of an inflection type to
+# Hunspell rules. These depend only on the affix file, so they are computed once.
+def compileInflectionType(inflection_type):
+	inflection_type.matchRegex = re.compile(__word_pattern_to_pcre(inflection_type.matchWord),
+	                                        re.IGNORECASE)
+	for rule in inflection_type.inflectionRules:
+		rule.hunspellRules = __regex_to_hunspell(rule.delSuffix, rule.addSuffix)
+	return inflection_type
+
 # Reads and returns a list of word classes from a file named file_name.
 def readInflectionTypes(file_name):
 	inflection_types = []
 	inputfile = codecs.open(file_name, 'r', 'UTF-8')
 	inftype = __read_inflection_type(inputfile)
 	while inftype != None:
-		inflection_types.append(inftype)
+		inflection_types.append(compileInflectionType(inftype))
 		inftype = __read_inflection_type(inputfile)
 	inputfile.close()
-	return inflection_types
+	return InflectionTypeList(inflection_types)
 
 
 def _replace_conditional_aposthrope(word):
@@ -434,16 +457,15 @@ def inflectWordWithType(word, inflection_type, infclass, gradclass, vowel_type =
 	elif gradclass in ['av1', 'av3', 'av5']: grad_type = voikkoutils.GRAD_SW
 	elif gradclass in ['av2', 'av4', 'av6']: grad_type = voikkoutils.GRAD_WS
 	if grad_type != voikkoutils.GRAD_NONE and grad_type != inflection_type.gradation: return []
-	if not re.compile(__word_pattern_to_pcre(inflection_type.matchWord),
-	                  re.IGNORECASE).match(word): return []
+	if inflection_type.matchRegex == None: compileInflectionType(inflection_type)
+	if not inflection_type.matchRegex.match(word): return []
 	inflection_list = []
 	if vowel_type == voikkoutils.VOWEL_DEFAULT:
 		vowel_type = voikkoutils.get_wordform_infl_vowel_type(word)
 	for rule in inflection_type.inflectionRules:
 		if rule.gradation == voikkoutils.GRAD_STRONG: word_base = word_grad[0]
 		else: word_base = word_grad[1]
-		hunspell_rules = __regex_to_hunspell(rule.delSuffix, rule.addSuffix)
-		for hunspell_rule in hunspell_rules:
+		for hunspell_rule in rule.hunspellRules:
 			if hunspell_rule[0] == '0': word_stripped_base = word_base
 			else: word_stripped_base = word_base[:-len(hunspell_rule[0])]
 			if hunspell_rule[1] == '0': affix = ''
@@ -500,6 +522,8 @@ def inflectWord(word, jo_infclass, inflection_types, vowel_type = voikkoutils.VO
 		if not gradclass in [u'av1', u'av2', u'av3', u'av4', u'av5', u'av6', u'-']:
 			return []
 	
+	if isinstance(inflection_types, InflectionTypeList):
+		inflection_types = inflection_types.byJoukahainenClass.get(infclass, [])
 	for inflection_type in inflection_types:
 		inflection = inflectWordWithType(word, inflection_type, infclass, gradclass, vowel_type)
 		if len(inflection) > 0: return inflection